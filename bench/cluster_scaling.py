@@ -0,0 +1,162 @@
+# bench/cluster_scaling.py
+# Ko‘p jarayonli rejimning kengayishi: bot.py'ni BOT_WORKERS=1,2,4 bilan alohida
+# jarayonda ishga tushirib (BOT_API_URL — bench/fake_api.py), bir xil update
+# to‘plamini yuboradi va update/s'ni o‘lchaydi. BOT_WORKERS=1 — oddiy bitta
+# jarayonli polling, >1 — cluster.py front + ishchilar.
+#
+#   python -m bench.cluster_scaling --workers 1,2,4 --users 400 --rounds 10
+#
+# Kanal yo‘q (obuna gate API chaqirmaydi); har bir update (/start, bo‘lim,
+# «⬅️ Orqaga») aynan bitta sendMessage beradi — shu bo‘yicha tugash aniqlanadi.
+from __future__ import annotations
+import argparse
+import asyncio
+import os
+import signal
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+_TMP = tempfile.TemporaryDirectory(prefix="bench-")
+os.environ["DB_PATH"] = os.path.join(_TMP.name, "cluster.db")
+
+import db
+from bench.fake_api import FakeBotAPI
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACK = "⬅️ Orqaga"
+
+
+async def _seed(sections: int, topics: int) -> List[str]:
+    await db.init_db()
+    titles = []
+    for i in range(1, sections + 1):
+        title = f"Bo‘lim {i}"
+        sid = await db.create_button(title)
+        for j in range(1, topics + 1):
+            await db.create_button(f"Mavzu {i}.{j}", sid)
+        titles.append(title)
+    await db.close_db()
+    return titles
+
+
+class _Feed:
+    def __init__(self, api: FakeBotAPI):
+        self.api = api
+        self.update_id = 0
+
+    def text(self, uid: int, text: str) -> None:
+        self.update_id += 1
+        i = self.update_id
+        self.api.push_update({"update_id": i, "message": {
+            "message_id": i, "date": int(time.time()),
+            "chat": {"id": uid, "type": "private", "first_name": f"U{uid}"},
+            "from": {"id": uid, "is_bot": False, "first_name": f"U{uid}"},
+            "text": text,
+        }})
+
+
+async def _wait_sent(api: FakeBotAPI, n: int, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while api.calls["sendMessage"] < n:
+        if time.monotonic() > deadline:
+            return False
+        await asyncio.sleep(0.005)
+    return True
+
+
+async def _one(api: FakeBotAPI, base: str, workers: int, titles: List[str],
+               args: argparse.Namespace) -> Dict[str, Any]:
+    env = dict(os.environ, BOT_WORKERS=str(workers), BOT_API_URL=base, BOT_TOKEN="123456:bench",
+               BOT_MODE="polling", METRICS_PORT="", DB_PATH=os.environ["DB_PATH"])
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, "bot.py", cwd=ROOT, env=env,
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+    )
+    feed = _Feed(api)
+    users = range(1000, 1000 + args.users)
+    try:
+        # isitish: har bir foydalanuvchi /start (ishchilar ham shu bilan tayyor bo‘ladi)
+        api.calls.clear()
+        t0 = time.perf_counter()
+        for uid in users:
+            feed.text(uid, "/start")
+        if not await _wait_sent(api, args.users, args.startup_timeout):
+            raise RuntimeError(f"BOT_WORKERS={workers}: bot javob bermadi")
+        ready_s = time.perf_counter() - t0
+
+        # o‘lchov: har bir foydalanuvchi rounds x (bo‘lim, orqaga), hammasi bir zumda navbatda
+        api.calls.clear()
+        total = 0
+        t0 = time.perf_counter()
+        for r in range(args.rounds):
+            for uid in users:
+                feed.text(uid, titles[(uid + r) % len(titles)])
+                feed.text(uid, BACK)
+                total += 2
+        done = await _wait_sent(api, total, args.timeout)
+        elapsed = time.perf_counter() - t0
+    finally:
+        if proc.returncode is None:
+            proc.send_signal(signal.SIGINT)
+            try:
+                await asyncio.wait_for(proc.wait(), 60)
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+        err = await proc.stderr.read()
+
+    if not done:
+        tail = err.decode(errors="replace")[-1500:]
+        raise RuntimeError(f"BOT_WORKERS={workers}: {api.calls['sendMessage']}/{total} update ishlandi\n{tail}")
+    return {
+        "workers": workers,
+        "updates": total,
+        "elapsed_s": elapsed,
+        "updates_per_s": total / elapsed,
+        "ready_s": ready_s,
+        "api_calls": sum(api.calls.values()),
+    }
+
+
+async def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    titles = await _seed(args.sections, args.topics)
+    api = FakeBotAPI(latency=args.latency_ms / 1000.0, jitter=args.jitter_ms / 1000.0, seed=1)
+    base = await api.start()
+    try:
+        return [await _one(api, base, w, titles, args) for w in args.workers]
+    finally:
+        await api.stop()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="BOT_WORKERS bo‘yicha update/s")
+    ap.add_argument("--workers", type=lambda v: [int(x) for x in v.split(",") if x.strip()], default=[1, 2, 4])
+    ap.add_argument("--users", type=int, default=400)
+    ap.add_argument("--rounds", type=int, default=10, help="har bir foydalanuvchi necha marta bo‘lim→orqaga qiladi")
+    ap.add_argument("--sections", type=int, default=8)
+    ap.add_argument("--topics", type=int, default=12)
+    ap.add_argument("--latency-ms", type=float, default=2.0)
+    ap.add_argument("--jitter-ms", type=float, default=1.0)
+    ap.add_argument("--startup-timeout", type=float, default=120.0)
+    ap.add_argument("--timeout", type=float, default=300.0)
+    args = ap.parse_args(argv)
+
+    try:
+        res = asyncio.run(run(args))
+    finally:
+        _TMP.cleanup()
+
+    base = res[0]["updates_per_s"]
+    print(f"Foydalanuvchilar: {args.users}   update'lar: {res[0]['updates']}   "
+          f"API kechikishi: {args.latency_ms}+{args.jitter_ms} ms   CPU: {os.cpu_count()}")
+    print(f"{'BOT_WORKERS':>11} {'update/s':>10} {'vaqt, s':>9} {'nisbat':>8} {'start, s':>9}")
+    for r in res:
+        print(f"{r['workers']:>11} {r['updates_per_s']:10.0f} {r['elapsed_s']:9.2f} "
+              f"{r['updates_per_s'] / base:7.2f}x {r['ready_s']:9.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+# bench/db_pool.py
+# Ulanish pool'i: har chaqiruvda aiosqlite.connect + _prepare (eski usul) va
+# db._read()/_tx() pool'i — 1M foydalanuvchili bazada so‘rov/s. Baza
+# vaqtinchalik faylda, tarmoq kerak emas.
+#
+#   python -m bench.db_pool --users 1000000 --ops 5000 --concurrency 32
+from __future__ import annotations
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+_TMP = tempfile.TemporaryDirectory(prefix="bench-")
+os.environ["DB_PATH"] = os.path.join(_TMP.name, "pool.db")
+
+import db
+
+_READ_SQL = "SELECT first_name, username, is_dead FROM users WHERE user_id=?"
+_WRITE_SQL = "UPDATE users SET last_ok_at=?, fail_count=0 WHERE user_id=?"
+
+
+async def _seed(users: int, chunk: int = 50_000) -> None:
+    ts = int(time.time())
+    for start in range(1, users + 1, chunk):
+        stop = min(users + 1, start + chunk)
+        async with db._tx() as conn:
+            await conn.executemany(
+                "INSERT INTO users(user_id, first_name, last_name, username, joined_at, joined_ts)"
+                " VALUES(?, ?, ?, ?, ?, ?)",
+                ((uid, f"U{uid}", None, f"user{uid}", None, ts - uid) for uid in range(start, stop)),
+            )
+
+
+# ---------- eski usul: har chaqiruvda yangi ulanish ----------
+async def _percall_read(uid: int) -> None:
+    async with db._connect() as conn:
+        await db._prepare(conn)
+        cur = await conn.execute(_READ_SQL, (uid,))
+        await cur.fetchone()
+        await cur.close()
+
+
+async def _percall_write(uid: int) -> None:
+    async with db._connect() as conn:
+        await db._prepare(conn)
+        await conn.execute(_WRITE_SQL, ("2024-01-01T00:00:00+00:00", uid))
+        await conn.commit()
+
+
+# ---------- pool ----------
+async def _pool_read(uid: int) -> None:
+    await db._fetchone(_READ_SQL, (uid,))
+
+
+async def _pool_write(uid: int) -> None:
+    await db._exec(_WRITE_SQL, ("2024-01-01T00:00:00+00:00", uid))
+
+
+async def _rate(fn: Callable[[int], Awaitable[None]], ids: List[int], concurrency: int) -> float:
+    """`concurrency` ta parallel chaqiruvchi bilan so‘rov/s."""
+    it = iter(ids)
+
+    async def worker() -> None:
+        for uid in it:
+            await fn(uid)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    return len(ids) / (time.perf_counter() - t0)
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    rnd = random.Random(args.seed)
+    await db.init_db()
+    t0 = time.perf_counter()
+    await _seed(args.users)
+    print(f"Foydalanuvchilar: {args.users}   to‘ldirish: {time.perf_counter() - t0:.1f} s")
+
+    def pick(n: int) -> List[int]:
+        return [rnd.randint(1, args.users) for _ in range(n)]
+
+    # yozuvlar kamroq: har per-call commit — alohida fsync/WAL yozuvi
+    reads, writes = args.ops, max(1, args.ops // 5)
+    out = {
+        "o‘qish (nuqtaviy)": {
+            "per-call": await _rate(_percall_read, pick(reads), args.concurrency),
+            "pool": await _rate(_pool_read, pick(reads), args.concurrency),
+        },
+        "yozish (UPDATE)": {
+            "per-call": await _rate(_percall_write, pick(writes), args.concurrency),
+            "pool": await _rate(_pool_write, pick(writes), args.concurrency),
+        },
+    }
+    await db.close_db()
+    return out
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Per-call ulanish va pool: so‘rov/s")
+    ap.add_argument("--users", type=int, default=1_000_000)
+    ap.add_argument("--ops", type=int, default=5000, help="o‘qishlar soni (yozishlar — 1/5)")
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args(argv)
+    try:
+        res = asyncio.run(run(args))
+    finally:
+        _TMP.cleanup()
+
+    print(f"DB_READ_POOL={db.READ_POOL_SIZE}   parallel: {args.concurrency}")
+    print(f"{'so‘rov':20} {'per-call, /s':>13} {'pool, /s':>11} {'tezlashish':>11}")
+    for name, r in res.items():
+        print(f"{name:20} {r['per-call']:13.0f} {r['pool']:11.0f} {r['pool'] / r['per-call']:10.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+# bench/fake_api.py
+# Telegram Bot API o‘rnini bosuvchi lokal aiohttp server (yuklama testlari uchun).
+# Bot(session=AiohttpSession(api=TelegramAPIServer.from_base(url))) bilan ishlaydi:
+# getUpdates navbatdan o‘qiladi, qolgan metodlar sun’iy kechikish va 429 bilan javob beradi.
+from __future__ import annotations
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set
+
+from aiohttp import web
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+
+# Hisobga olinmaydigan xizmat metodlari (kechikish/429 ham yo‘q)
+_SERVICE = {"getupdates", "getme", "deletewebhook", "setwebhook", "close", "logout"}
+
+_MESSAGE_METHODS = {
+    "sendmessage", "editmessagetext", "sendphoto", "sendvideo",
+    "senddocument", "sendaudio", "sendanimation",
+}
+
+
+class FakeBotAPI:
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0,
+                 rate_429: float = 0.0, retry_after: int = 1, seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.calls: Counter = Counter()
+        self.throttled = 0
+        self.unsubscribed: Set[int] = set()   # getChatMember bular uchun "left" qaytaradi
+        self._rnd = random.Random(seed)
+        self._pending: List[dict] = []
+        self._has_updates = asyncio.Event()
+        self._msg_id = 0
+        self._runner: Optional[web.AppRunner] = None
+
+    # ---------- boshqaruv ----------
+    def push_update(self, raw: dict) -> None:
+        self._pending.append(raw)
+        self._has_updates.set()
+
+    def subscribe(self, user_id: int) -> None:
+        self.unsubscribed.discard(user_id)
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        host, port = self._runner.addresses[0][:2]
+        return f"http://{host}:{port}"
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    # ---------- HTTP ----------
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        name = method.lower()
+        data = await request.post()
+
+        if name == "getupdates":
+            return self._ok(await self._get_updates(data))
+        if name in _SERVICE:
+            return self._ok(BOT_USER if name == "getme" else True)
+
+        self.calls[method] += 1
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + self._rnd.random() * self.jitter)
+        if self.rate_429 and self._rnd.random() < self.rate_429:
+            self.throttled += 1
+            return web.json_response({
+                "ok": False, "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }, status=429)
+        return self._ok(self._result(name, data))
+
+    @staticmethod
+    def _ok(result: Any) -> web.Response:
+        return web.json_response({"ok": True, "result": result})
+
+    async def _get_updates(self, data) -> List[dict]:
+        if not self._pending:
+            self._has_updates.clear()
+            timeout = min(float(data.get("timeout") or 0), 1.0) or 0.01
+            try:
+                await asyncio.wait_for(self._has_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        batch, self._pending = self._pending[:100], self._pending[100:]
+        return batch
+
+    def _message(self, chat_id: Any, **extra: Any) -> Dict[str, Any]:
+        self._msg_id += 1
+        msg = {
+            "message_id": self._msg_id,
+            "date": int(time.time()),
+            "chat": {"id": int(chat_id or 0), "type": "private"},
+            "from": BOT_USER,
+        }
+        msg.update(extra)
+        return msg
+
+    def _result(self, name: str, data) -> Any:
+        if name == "getchatmember":
+            uid = int(data.get("user_id") or 0)
+            user = {"id": uid, "is_bot": False, "first_name": f"U{uid}"}
+            return {"status": "left" if uid in self.unsubscribed else "member", "user": user}
+        if name in _MESSAGE_METHODS:
+            extra: Dict[str, Any] = {}
+            if "text" in data:
+                extra["text"] = data["text"]
+            if name == "sendphoto":
+                extra["photo"] = [{"file_id": "p", "file_unique_id": "p", "width": 1, "height": 1}]
+            return self._message(data.get("chat_id"), **extra)
+        if name == "copymessage":
+            self._msg_id += 1
+            return {"message_id": self._msg_id}
+        if name == "sendmediagroup":
+            n = len(json.loads(data.get("media") or "[]"))
+            return [self._message(data.get("chat_id")) for _ in range(n)]
+        return True
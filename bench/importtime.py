@@ -0,0 +1,113 @@
+# bench/importtime.py
+# Sovuq start byudjeti: `python -X importtime -c "import bot"` ni alohida jarayonda
+# ishga tushirib, majburiy kutubxonalar (aiogram, aiosqlite, dotenv) ustiga qo‘shilgan
+# vaqtni va loyiha modullarining o‘z vaqtini tekshiradi. aiogram'ning o‘zi mashinaga
+# qarab 0.5–5 s oladi, shuning uchun asosiy byudjet — ana shu poldan ortig‘i.
+# Byudjetdan oshsa yoki dangasa yuklanishi kerak bo‘lgan modul (openpyxl, aiohttp.web,
+# multiprocessing) import paytida tortilsa — chiqish kodi 1 (CI'da tekshiruv sifatida).
+#
+#   python -m bench.importtime --overhead-ms 400 --project-ms 150 --runs 5
+#   python -m bench.importtime --budget-ms 3000     # qo‘shimcha: mutlaq chegara
+from __future__ import annotations
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# import bot paytida yuklanmasligi kerak: faqat kerakli joyda (eksport, /metrics, cluster)
+LAZY = ("openpyxl", "aiohttp.web", "multiprocessing")
+
+PROJECT = ("bot", "config", "db", "keyboards", "handlers", "utils")
+
+# pol: bot.py ularsiz ishlay olmaydi
+FLOOR = "aiogram, aiogram.types, aiogram.methods, aiogram.fsm.storage.base, aiosqlite, dotenv"
+
+Row = Tuple[int, int, str]   # (self_us, cumulative_us, module)
+
+
+def _sample(module: str) -> List[Row]:
+    env = dict(os.environ, BOT_TOKEN=os.environ.get("BOT_TOKEN") or "0:importtime")
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} xato bilan tugadi:\n{proc.stderr[-2000:]}")
+    rows: List[Row] = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((int(self_us), int(cum_us), name.strip()))
+    return rows
+
+
+def _is_project(name: str) -> bool:
+    return name.split(".", 1)[0] in PROJECT
+
+
+def _total(rows: List[Row]) -> int:
+    return sum(s for s, _c, _n in rows)
+
+
+def measure(module: str, runs: int) -> Dict[str, object]:
+    """Pol va modul navbatma-navbat o‘lchanadi; har biridan eng yaxshisi (min) olinadi."""
+    floor_us: Optional[int] = None
+    best: Optional[List[Row]] = None
+    for _ in range(max(1, runs)):
+        f = _total(_sample(FLOOR))
+        floor_us = f if floor_us is None else min(floor_us, f)
+        rows = _sample(module)
+        if best is None or _total(rows) < _total(best):
+            best = rows
+    assert best is not None and floor_us is not None
+    return {
+        "total_us": _total(best),
+        "floor_us": floor_us,
+        "project_us": sum(s for s, _c, n in best if _is_project(n)),
+        "lazy": sorted({n for _s, _c, n in best if any(n == m or n.startswith(m + ".") for m in LAZY)}),
+        "top": sorted(best, reverse=True)[:15],
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="import bot vaqti byudjeti")
+    ap.add_argument("--module", default="bot")
+    ap.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "0")),
+                    help="import vaqtining mutlaq chegarasi (0 — tekshirilmaydi)")
+    ap.add_argument("--overhead-ms", type=float, default=float(os.getenv("IMPORT_OVERHEAD_BUDGET_MS", "400")),
+                    help="majburiy kutubxonalar ustiga qo‘shimcha vaqt chegarasi")
+    ap.add_argument("--project-ms", type=float, default=float(os.getenv("IMPORT_PROJECT_BUDGET_MS", "150")),
+                    help="loyiha modullarining o‘z (self) vaqti yig‘indisi")
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args(argv)
+
+    r = measure(args.module, args.runs)
+    total_ms, project_ms = r["total_us"] / 1000, r["project_us"] / 1000
+    overhead_ms = total_ms - r["floor_us"] / 1000
+    print(f"import {args.module}: {total_ms:.0f} ms   pol (aiogram va b.): {r['floor_us'] / 1000:.0f} ms   "
+          f"ortig‘i: {overhead_ms:.0f} ms (byudjet {args.overhead_ms:.0f})")
+    print(f"loyiha modullari: {project_ms:.1f} ms (byudjet {args.project_ms:.0f})")
+    print(f"{'self, ms':>9} {'jami, ms':>9}  modul")
+    for self_us, cum_us, name in r["top"]:
+        print(f"{self_us / 1000:9.1f} {cum_us / 1000:9.1f}  {name}")
+
+    failed = False
+    if overhead_ms > args.overhead_ms:
+        print(f"XATO: import {args.module} poldan {overhead_ms:.0f} ms ortiq (byudjet {args.overhead_ms:.0f} ms)")
+        failed = True
+    if args.budget_ms and total_ms > args.budget_ms:
+        print(f"XATO: import {args.module} byudjetdan oshdi ({total_ms:.0f} > {args.budget_ms:.0f} ms)")
+        failed = True
+    if project_ms > args.project_ms:
+        print(f"XATO: loyiha modullari byudjetdan oshdi ({project_ms:.1f} > {args.project_ms:.0f} ms)")
+        failed = True
+    if r["lazy"]:
+        print("XATO: dangasa yuklanishi kerak bo‘lgan modullar import qilindi: " + ", ".join(r["lazy"]))
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
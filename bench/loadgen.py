@@ -0,0 +1,392 @@
+# bench/loadgen.py
+# Yuklama generatori: N ta virtual foydalanuvchi haqiqiy start_router/admin_router
+# orqali /start, menyu navigatsiyasi, kontentli tugmalar va «✅ Tekshirish»ni
+# bosadi. Bot API — bench/fake_api.py (tarmoqsiz), baza — vaqtinchalik fayl.
+#
+#   python -m bench.loadgen --users 200 --rounds 5 --latency-ms 20 --rate-429 0.01
+#   python -m bench.loadgen --mode both      # long polling va webhook yonma-yon
+#
+# Har bir foydalanuvchi yopiq siklda ishlaydi: keyingi update oldingisi
+# qayta ishlangach yuboriladi. --mode webhook'da update'lar fake API navbati
+# o‘rniga webhook.UpdateHandler'ga HTTP POST qilinadi.
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+_TMP = tempfile.TemporaryDirectory(prefix="bench-")
+os.environ["DB_PATH"] = os.path.join(_TMP.name, "bench.db")
+
+from aiohttp import ClientSession, web
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+import db
+from bot import build_dispatcher
+import handlers.start as start_handlers
+from utils.fsm_storage import SQLiteStorage
+from bench.fake_api import FakeBotAPI, BOT_USER
+from webhook import UpdateHandler, WEBHOOK_PATH
+
+CHANNEL_ID = "-1001"
+BACK = "⬅️ Orqaga"
+
+
+# ---------- o‘lchovlar ----------
+class Stats:
+    def __init__(self) -> None:
+        self.latencies: List[float] = []
+        self.e2e: List[float] = []       # yuborishdan handler tugashigacha
+        self.gate: Dict[str, List[float]] = {"subscribed": [], "unsubscribed": []}   # obuna baholash vaqti
+        self.errors = 0
+        self.timeouts = 0
+        self.db: Counter = Counter()
+        self.waiters: Dict[int, asyncio.Future] = {}
+
+
+class _Timer(BaseMiddleware):
+    """dp.update outer middleware: handler vaqtini o‘lchaydi va foydalanuvchini uyg‘otadi."""
+
+    def __init__(self, stats: Stats):
+        self.stats = stats
+
+    async def __call__(self, handler, event, data):
+        t0 = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            self.stats.errors += 1
+            raise
+        finally:
+            self.stats.latencies.append(time.perf_counter() - t0)
+            fut = self.stats.waiters.pop(event.update_id, None)
+            if fut is not None and not fut.done():
+                fut.set_result(None)
+
+
+def _count_db(stats: Stats) -> None:
+    """db._read/_tx'ni o‘raydi: har bir ulanish olish — bitta SQLite chaqiruvi."""
+    orig_read, orig_tx = db._read, db._tx
+
+    @asynccontextmanager
+    async def read():
+        stats.db["read"] += 1
+        async with orig_read() as conn:
+            yield conn
+
+    @asynccontextmanager
+    async def tx():
+        stats.db["write"] += 1
+        async with orig_tx() as conn:
+            yield conn
+
+    db._read, db._tx = read, tx
+
+
+def _time_gate(stats: Stats) -> None:
+    """SubscriptionGate chaqiradigan evaluate_subscriptions'ni o‘raydi: natija bo‘yicha vaqt."""
+    orig = start_handlers.evaluate_subscriptions
+
+    async def timed(*a, **kw):
+        t0 = time.perf_counter()
+        res = await orig(*a, **kw)
+        stats.gate["subscribed" if res.ok else "unsubscribed"].append(time.perf_counter() - t0)
+        return res
+
+    start_handlers.evaluate_subscriptions = timed
+
+
+def _pcts(values: List[float]) -> Dict[str, float]:
+    return {p: round(_pct(values, q) * 1000, 2) for p, q in (("p50", 50), ("p99", 99), ("max", 100))}
+
+
+def _pct(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    return s[min(len(s) - 1, int(round(p / 100.0 * (len(s) - 1))))]
+
+
+# ---------- ma’lumotlar ----------
+async def _seed(sections: int, topics: int) -> Dict[str, List[str]]:
+    """Kanal va sections x topics daraxt; har bir mavzuda matn + 2 rasm (albom)."""
+    await db.save_channel(CHANNEL_ID, "Bench kanal", "bench_channel", None, "https://t.me/bench_channel")
+    tree: Dict[str, List[str]] = {}
+    for i in range(1, sections + 1):
+        title = f"Bo‘lim {i}"
+        sid = await db.create_button(title)
+        tree[title] = []
+        for j in range(1, topics + 1):
+            child = f"Mavzu {i}.{j}"
+            bid = await db.create_button(child, sid)
+            await db.add_button_content(bid, "text", None, f"{child} matni")
+            await db.add_button_content(bid, "photo", f"photo-{i}-{j}-a", None)
+            await db.add_button_content(bid, "photo", f"photo-{i}-{j}-b", None)
+            tree[title].append(child)
+    return tree
+
+
+# ---------- virtual foydalanuvchilar ----------
+class Load:
+    def __init__(self, api: FakeBotAPI, stats: Stats, timeout: float,
+                 http: Optional[ClientSession] = None, webhook_url: str = ""):
+        self.api = api
+        self.http = http
+        self.webhook_url = webhook_url
+        self.stats = stats
+        self.timeout = timeout
+        self._update_id = 0
+        self.sent = 0
+
+    @staticmethod
+    def _user(uid: int) -> Dict[str, Any]:
+        return {"id": uid, "is_bot": False, "first_name": f"U{uid}"}
+
+    def _next_id(self) -> int:
+        self._update_id += 1
+        return self._update_id
+
+    async def _send(self, raw: Dict[str, Any]) -> None:
+        fut = asyncio.get_running_loop().create_future()
+        self.stats.waiters[raw["update_id"]] = fut
+        self.sent += 1
+        t0 = time.perf_counter()
+        try:
+            if self.http is not None:
+                async with self.http.post(self.webhook_url, json=raw) as r:
+                    r.raise_for_status()
+            else:
+                self.api.push_update(raw)
+            await asyncio.wait_for(fut, self.timeout)
+            self.stats.e2e.append(time.perf_counter() - t0)
+        except asyncio.TimeoutError:
+            self.stats.timeouts += 1
+            self.stats.waiters.pop(raw["update_id"], None)
+
+    async def text(self, uid: int, text: str) -> None:
+        i = self._next_id()
+        chat = {"id": uid, "type": "private", "first_name": f"U{uid}"}
+        await self._send({"update_id": i, "message": {
+            "message_id": i, "date": int(time.time()), "chat": chat,
+            "from": self._user(uid), "text": text,
+        }})
+
+    async def callback(self, uid: int, data: str) -> None:
+        i = self._next_id()
+        chat = {"id": uid, "type": "private", "first_name": f"U{uid}"}
+        await self._send({"update_id": i, "callback_query": {
+            "id": str(i), "from": self._user(uid), "chat_instance": str(uid), "data": data,
+            "message": {"message_id": i, "date": int(time.time()), "chat": chat,
+                        "from": BOT_USER, "text": "👇 Majburiy kanallar:"},
+        }})
+
+    async def session(self, uid: int, tree: Dict[str, List[str]], rounds: int, rnd: random.Random) -> None:
+        await self.text(uid, "/start")
+        if uid in self.api.unsubscribed:
+            self.api.subscribe(uid)          # kanalga kirdi — endi «✅ Tekshirish»
+            await self.callback(uid, "check_sub")
+        sections = list(tree)
+        for _ in range(rounds):
+            section = rnd.choice(sections)
+            await self.text(uid, section)
+            await self.text(uid, rnd.choice(tree[section]))
+            await self.text(uid, BACK)
+
+
+# ---------- ishga tushirish ----------
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    rnd = random.Random(args.seed)
+    api = FakeBotAPI(latency=args.latency_ms / 1000.0, jitter=args.jitter_ms / 1000.0,
+                     rate_429=args.rate_429, seed=args.seed)
+    base = await api.start()
+
+    await db.init_db()
+    tree = await _seed(args.sections, args.topics)
+
+    stats = Stats()
+    _count_db(stats)
+    _time_gate(stats)
+    bot = Bot("123456:bench", session=AiohttpSession(api=TelegramAPIServer.from_base(base)))
+    storage = SQLiteStorage()
+    dp = build_dispatcher(storage)
+    dp.update.outer_middleware(_Timer(stats))
+
+    users = list(range(1000, 1000 + args.users))
+    api.unsubscribed.update(u for u in users if rnd.random() < args.unsub)
+    load = Load(api, stats, args.timeout)
+
+    polling: Optional[asyncio.Task] = None
+    handler: Optional[UpdateHandler] = None
+    runner: Optional[web.AppRunner] = None
+    if args.mode == "webhook":
+        handler = UpdateHandler(dp, bot, secret="")
+        app = web.Application()
+        app.router.add_post(WEBHOOK_PATH, handler.handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", 0).start()
+        host, port = runner.addresses[0][:2]
+        load.http = ClientSession()
+        load.webhook_url = f"http://{host}:{port}{WEBHOOK_PATH}"
+        await dp.emit_startup(bot=bot)
+    else:
+        polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, polling_timeout=1))
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(
+        load.session(uid, tree, args.rounds, random.Random(rnd.random())) for uid in users
+    ))
+    elapsed = time.perf_counter() - t0
+
+    if polling is not None:
+        await dp.stop_polling()
+        await polling
+    if handler is not None:
+        await handler.drain()
+        await load.http.close()
+        await runner.cleanup()
+        await dp.emit_shutdown(bot=bot)
+    await storage.close()
+    await db.close_db()
+    await bot.session.close()
+    await api.stop()
+
+    n = max(1, len(stats.latencies))
+    api_total = sum(api.calls.values())
+    return {
+        "mode": args.mode,
+        "users": args.users,
+        "updates": len(stats.latencies),
+        "sent": load.sent,
+        "elapsed_s": round(elapsed, 3),
+        "updates_per_s": round(len(stats.latencies) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {p: round(_pct(stats.latencies, q) * 1000, 2)
+                       for p, q in (("p50", 50), ("p95", 95), ("p99", 99), ("max", 100))},
+        "e2e_ms": {p: round(_pct(stats.e2e, q) * 1000, 2)
+                   for p, q in (("p50", 50), ("p95", 95), ("p99", 99), ("max", 100))},
+        "gate_ms": {
+            "all": _pcts(stats.gate["subscribed"] + stats.gate["unsubscribed"]),
+            "subscribed": _pcts(stats.gate["subscribed"]),
+            "unsubscribed": _pcts(stats.gate["unsubscribed"]),
+            "checks": {k: len(v) for k, v in stats.gate.items()},
+        },
+        "api_calls_per_update": round(api_total / n, 2),
+        "api_calls": dict(api.calls.most_common()),
+        "db_reads_per_update": round(stats.db["read"] / n, 2),
+        "db_writes_per_update": round(stats.db["write"] / n, 2),
+        "throttled_429": api.throttled,
+        "errors": stats.errors,
+        "timeouts": stats.timeouts,
+    }
+
+
+def _print_report(r: Dict[str, Any]) -> None:
+    lat, e2e = r["latency_ms"], r["e2e_ms"]
+    print(f"Rejim: {r['mode']}")
+    print(f"Foydalanuvchilar: {r['users']}   update'lar: {r['updates']}/{r['sent']}   vaqt: {r['elapsed_s']} s")
+    print(f"Tezlik:           {r['updates_per_s']} update/s")
+    print(f"Handler (ms):     p50 {lat['p50']}   p95 {lat['p95']}   p99 {lat['p99']}   max {lat['max']}")
+    print(f"Yetkazish (ms):   p50 {e2e['p50']}   p95 {e2e['p95']}   p99 {e2e['p99']}   max {e2e['max']}")
+    g = r["gate_ms"]
+    print(f"Obuna gate (ms):  hammasi p50 {g['all']['p50']} p99 {g['all']['p99']}   "
+          f"obunali p50 {g['subscribed']['p50']} p99 {g['subscribed']['p99']} ({g['checks']['subscribed']})   "
+          f"obunasiz p50 {g['unsubscribed']['p50']} p99 {g['unsubscribed']['p99']} ({g['checks']['unsubscribed']})")
+    print(f"Bot API / update: {r['api_calls_per_update']}   "
+          + ", ".join(f"{k}={v}" for k, v in r["api_calls"].items()))
+    print(f"SQLite / update:  o‘qish {r['db_reads_per_update']}   yozish {r['db_writes_per_update']}")
+    print(f"429: {r['throttled_429']}   xatolar: {r['errors']}   timeout: {r['timeouts']}")
+
+
+_COMPARE = (
+    ("updates_per_s", "update/s"),
+    ("latency_ms.p50", "handler p50, ms"),
+    ("latency_ms.p99", "handler p99, ms"),
+    ("gate_ms.all.p50", "gate p50, ms"),
+    ("gate_ms.all.p99", "gate p99, ms"),
+    ("e2e_ms.p50", "yetkazish p50, ms"),
+    ("e2e_ms.p95", "yetkazish p95, ms"),
+    ("e2e_ms.p99", "yetkazish p99, ms"),
+    ("e2e_ms.max", "yetkazish max, ms"),
+    ("api_calls_per_update", "Bot API / update"),
+    ("errors", "xatolar"),
+    ("timeouts", "timeout"),
+)
+
+
+def _compare(args: argparse.Namespace) -> int:
+    """Har bir rejim alohida jarayonda (toza baza va keshlar), natijalar yonma-yon."""
+    reports: Dict[str, Dict[str, Any]] = {}
+    for mode in ("polling", "webhook"):
+        cmd = [sys.executable, "-m", "bench.loadgen", "--mode", mode, "--json"]
+        for k, v in vars(args).items():
+            if k not in ("mode", "json"):
+                cmd += [f"--{k.replace('_', '-')}", str(v)]
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        if proc.returncode not in (0, 1):
+            print(proc.stderr[-2000:], file=sys.stderr)
+            return proc.returncode
+        reports[mode] = json.loads(proc.stdout)
+
+    if args.json:
+        print(json.dumps(reports, ensure_ascii=False, indent=2))
+        return 1 if any(r["timeouts"] for r in reports.values()) else 0
+
+    def get(r: Dict[str, Any], path: str) -> Any:
+        for part in path.split("."):
+            r = r[part]
+        return r
+
+    print(f"Foydalanuvchilar: {args.users}   raundlar: {args.rounds}   "
+          f"API kechikishi: {args.latency_ms}+{args.jitter_ms} ms")
+    print(f"{'':22} {'polling':>10} {'webhook':>10}")
+    for path, title in _COMPARE:
+        print(f"{title:22} {get(reports['polling'], path):>10} {get(reports['webhook'], path):>10}")
+    return 1 if any(r["timeouts"] for r in reports.values()) else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Bot uchun lokal yuklama testi")
+    ap.add_argument("--mode", choices=("polling", "webhook", "both"), default="polling",
+                    help="update'lar qanday keladi; both — ikkalasi yonma-yon")
+    ap.add_argument("--users", type=int, default=100)
+    ap.add_argument("--rounds", type=int, default=3, help="har bir foydalanuvchi necha marta bo‘lim→mavzu→orqaga qiladi")
+    ap.add_argument("--sections", type=int, default=4)
+    ap.add_argument("--topics", type=int, default=5)
+    ap.add_argument("--unsub", type=float, default=0.3, help="obunasiz boshlaydiganlar ulushi")
+    ap.add_argument("--latency-ms", type=float, default=10.0)
+    ap.add_argument("--jitter-ms", type=float, default=5.0)
+    ap.add_argument("--rate-429", type=float, default=0.0, help="har bir API chaqiruvida 429 ehtimoli")
+    ap.add_argument("--timeout", type=float, default=30.0, help="bitta update uchun kutish (s)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", action="store_true", help="hisobotni JSON ko‘rinishida chiqarish")
+    args = ap.parse_args(argv)
+
+    if args.mode == "both":
+        _TMP.cleanup()
+        return _compare(args)
+
+    logging.basicConfig(level=logging.CRITICAL)
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        _TMP.cleanup()
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        _print_report(report)
+    return 1 if report["timeouts"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+# bench/menu_render.py
+# Menyu klaviaturasi: har safar reply_menu_kb() qurish va cached_reply_menu_kb()
+# keshidan olish, hamda aiogram so‘rovga qo‘yishdagi seriyalash (prepare_value)
+# — render/s. Baza ham, tarmoq ham kerak emas.
+#
+#   python -m bench.menu_render --levels 50 --buttons 24 --cols 2 --renders 20000
+from __future__ import annotations
+import argparse
+import random
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+
+from keyboards import cached_reply_menu_kb, reply_menu_kb
+
+Level = Tuple[Optional[int], List[Tuple[int, str]]]
+
+
+def _levels(n: int, buttons: int) -> List[Level]:
+    """Ildiz + (n-1) ta ichki daraxt darajasi, har birida `buttons` ta tugma."""
+    out: List[Level] = []
+    next_id = 1
+    for lvl in range(n):
+        parent = None if lvl == 0 else lvl
+        btns = []
+        for pos in range(1, buttons + 1):
+            btns.append((next_id, f"📘 Bo‘lim {lvl}.{pos} — mavzu"))
+            next_id += 1
+        out.append((parent, btns))
+    return out
+
+
+def _rate(fn: Callable[[Level], object], picks: List[Level]) -> float:
+    t0 = time.perf_counter()
+    for lvl in picks:
+        fn(lvl)
+    return len(picks) / (time.perf_counter() - t0)
+
+
+def run(args: argparse.Namespace) -> Dict[str, float]:
+    rnd = random.Random(args.seed)
+    levels = _levels(args.levels, args.buttons)
+    picks = [rnd.choice(levels) for _ in range(args.renders)]
+    cols, version = args.cols, 1
+
+    bot = Bot("123456:bench", session=AiohttpSession())
+    session = bot.session
+
+    def build(lvl: Level):
+        return reply_menu_kb(lvl[1], cols, with_back=lvl[0] is not None)
+
+    def cached(lvl: Level):
+        return cached_reply_menu_kb(lvl[0], lvl[1], cols, version)
+
+    for lvl in levels:        # kesh isitiladi (birinchi ko‘rish — oddiy qurish)
+        cached(lvl)
+
+    return {
+        "reply_menu_kb (qurish)":           _rate(build, picks),
+        "cached_reply_menu_kb":             _rate(cached, picks),
+        "qurish + seriyalash":              _rate(lambda l: session.prepare_value(build(l), bot, {}), picks),
+        "kesh + seriyalash":                _rate(lambda l: session.prepare_value(cached(l), bot, {}), picks),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Menyu klaviaturasi: render/s")
+    ap.add_argument("--levels", type=int, default=50, help="daraxtdagi menyu darajalari")
+    ap.add_argument("--buttons", type=int, default=24, help="har bir darajadagi tugmalar")
+    ap.add_argument("--cols", type=int, default=2)
+    ap.add_argument("--renders", type=int, default=20000)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args(argv)
+
+    res = run(args)
+    base = res["reply_menu_kb (qurish)"]
+    print(f"Darajalar: {args.levels}   tugmalar: {args.buttons}   ustunlar: {args.cols}")
+    print(f"{'usul':32} {'render/s':>12} {'µs/render':>10} {'nisbat':>8}")
+    for name, r in res.items():
+        print(f"{name:32} {r:12.0f} {1e6 / r:10.1f} {r / base:7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
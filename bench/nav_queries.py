@@ -0,0 +1,110 @@
+# bench/nav_queries.py
+# Navigatsiya so‘rovlari ~10k tugmali daraxtda: migratsiya 2 (indekslar) dan
+# oldin va keyin. Baza vaqtinchalik faylda, tarmoq kerak emas.
+#
+#   python -m bench.nav_queries --roots 20 --fanout 20 --leaves 24 --samples 300
+from __future__ import annotations
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+_TMP = tempfile.TemporaryDirectory(prefix="bench-")
+os.environ["DB_PATH"] = os.path.join(_TMP.name, "nav.db")
+
+import db
+
+
+async def _seed(roots: int, fanout: int, leaves: int) -> Tuple[List[int], List[int]]:
+    """roots x fanout x leaves daraxt; har bir barg tugmada 2 ta kontent."""
+    parents: List[int] = []
+    leaf_ids: List[int] = []
+    async with db._tx() as conn:
+        next_id = 1
+
+        async def level(pids: List[Optional[int]], n: int, prefix: str) -> List[int]:
+            nonlocal next_id
+            rows, ids = [], []
+            for pid in pids:
+                for pos in range(1, n + 1):
+                    rows.append((next_id, pid, f"{prefix} {pid or 0}.{pos}", pos))
+                    ids.append(next_id)
+                    next_id += 1
+            await conn.executemany("INSERT INTO buttons(id, parent_id, title, pos) VALUES(?, ?, ?, ?)", rows)
+            return ids
+
+        top = await level([None], roots, "Bo‘lim")
+        mid = await level(top, fanout, "Mavzu")
+        leaf_ids = await level(mid, leaves, "Dars")
+        parents = top + mid
+        await conn.executemany(
+            "INSERT INTO button_contents(button_id, media_type, file_id, caption) VALUES(?, ?, ?, ?)",
+            [(bid, mt, f"f{bid}{mt}", None) for bid in leaf_ids for mt in ("photo", "video")],
+        )
+    return parents, leaf_ids
+
+
+async def _time(fn: Callable[[Any], Awaitable[Any]], args: List[Any]) -> float:
+    t0 = time.perf_counter()
+    for a in args:
+        await fn(a)
+    return (time.perf_counter() - t0) / max(1, len(args))
+
+
+async def _measure(parents: List[int], leaves: List[int], samples: int, rnd: random.Random) -> Dict[str, float]:
+    titles = await db._fetchall("SELECT parent_id, title FROM buttons WHERE parent_id IS NOT NULL")
+    pick_p = [rnd.choice(parents) for _ in range(samples)]
+    pick_l = [rnd.choice(leaves) for _ in range(samples)]
+    pick_t = [rnd.choice(titles) for _ in range(samples)]
+    return {
+        "list_buttons(parent)":        await _time(db.list_buttons, pick_p),
+        "find_button_by_title":        await _time(lambda pt: db.find_button_by_title(*pt), pick_t),
+        "has_children":                await _time(db.has_children, pick_l),
+        "_next_pos":                   await _time(db._next_pos, pick_p),
+        "list_button_contents":        await _time(db.list_button_contents, pick_l),
+        "reload_button_tree (butun)":  await _time(lambda _: db.reload_button_tree(), range(max(1, samples // 50))),
+    }
+
+
+async def run(args: argparse.Namespace) -> None:
+    rnd = random.Random(args.seed)
+    await db.open_db()
+    await db.migrate(1)
+    parents, leaves = await _seed(args.roots, args.fanout, args.leaves)
+    total = await db._fetchval("SELECT COUNT(*) FROM buttons")
+
+    before = await _measure(parents, leaves, args.samples, rnd)
+    t0 = time.perf_counter()
+    await db.migrate()
+    took = time.perf_counter() - t0
+    after = await _measure(parents, leaves, args.samples, rnd)
+    await db.close_db()
+
+    print(f"Tugmalar: {total}   migratsiya 1 → {len(db.MIGRATIONS)}: {took * 1000:.0f} ms")
+    print(f"{'so‘rov':30} {'oldin, µs':>12} {'keyin, µs':>12} {'tezlashish':>11}")
+    for name in before:
+        b, a = before[name] * 1e6, after[name] * 1e6
+        print(f"{name:30} {b:12.1f} {a:12.1f} {b / a if a else 0:10.1f}x")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Navigatsiya so‘rovlari: indekslardan oldin/keyin")
+    ap.add_argument("--roots", type=int, default=20)
+    ap.add_argument("--fanout", type=int, default=20)
+    ap.add_argument("--leaves", type=int, default=24)
+    ap.add_argument("--samples", type=int, default=300)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args(argv)
+    try:
+        asyncio.run(run(args))
+    finally:
+        _TMP.cleanup()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+# bench/user_upserts.py
+# /start'dagi foydalanuvchi yozuvi: har chaqiruvda commit qiluvchi upsert_user()
+# va write-behind queue_user_upsert() + flush_users() — N ta parallel /start
+# ostida commit/s, foydalanuvchi/s va chaqiruv kechikishi. Baza vaqtinchalik faylda.
+#
+#   python -m bench.user_upserts --users 20000 --concurrency 200
+from __future__ import annotations
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+_TMP = tempfile.TemporaryDirectory(prefix="bench-")
+os.environ["DB_PATH"] = os.path.join(_TMP.name, "upserts.db")
+
+import db
+
+
+class _Commits:
+    """db._tx'ni o‘raydi: har bir tranzaksiya — bitta commit."""
+
+    def __init__(self) -> None:
+        self.n = 0
+        orig = db._tx
+
+        @asynccontextmanager
+        async def tx():
+            async with orig() as conn:
+                yield conn
+            self.n += 1
+
+        db._tx = tx
+
+
+def _pct(values: List[float], p: float) -> float:
+    s = sorted(values)
+    return s[min(len(s) - 1, int(round(p / 100.0 * (len(s) - 1))))] if s else 0.0
+
+
+async def _direct(u: Any) -> None:
+    await db.upsert_user(u)
+
+
+async def _queued(u: Any) -> None:
+    db.queue_user_upsert(u)
+
+
+async def _run(call: Callable[[Any], Awaitable[None]], first_id: int, users: int,
+               concurrency: int, commits: _Commits) -> Dict[str, float]:
+    todo = iter(range(first_id, first_id + users))
+    lat: List[float] = []
+
+    async def client() -> None:
+        for uid in todo:
+            u = SimpleNamespace(id=uid, first_name=f"U{uid}", last_name=None, username=f"user{uid}")
+            t0 = time.perf_counter()
+            await call(u)
+            lat.append(time.perf_counter() - t0)
+            await asyncio.sleep(0)      # keyingi /start — boshqa update
+
+    before = commits.n
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(max(1, concurrency))))
+    await db.flush_users()              # qolgan navbat ham diskka tushsin
+    elapsed = time.perf_counter() - t0
+    n = commits.n - before
+    stored = await db._fetchval("SELECT COUNT(*) FROM users WHERE user_id BETWEEN ? AND ?",
+                                (first_id, first_id + users - 1))
+    return {
+        "elapsed_s": elapsed,
+        "users_per_s": users / elapsed,
+        "commits": n,
+        "commits_per_s": n / elapsed,
+        "p50_ms": _pct(lat, 50) * 1000,
+        "p99_ms": _pct(lat, 99) * 1000,
+        "max_ms": _pct(lat, 100) * 1000,
+        "stored": stored,
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    await db.init_db()
+    commits = _Commits()
+    out = {
+        "upsert_user (commit)": await _run(_direct, 1, args.users, args.concurrency, commits),
+        "queue_user_upsert": await _run(_queued, args.users + 1, args.users, args.concurrency, commits),
+    }
+    await db.close_db()
+    return out
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="/start foydalanuvchi yozuvi: to‘g‘ridan-to‘g‘ri va write-behind")
+    ap.add_argument("--users", type=int, default=20000)
+    ap.add_argument("--concurrency", type=int, default=200, help="bir vaqtdagi /start'lar")
+    args = ap.parse_args(argv)
+    try:
+        res = asyncio.run(run(args))
+    finally:
+        _TMP.cleanup()
+
+    print(f"Foydalanuvchilar: {args.users}   parallel: {args.concurrency}   "
+          f"USER_FLUSH_MS={db.USER_FLUSH_MS}   USER_FLUSH_ROWS={db.USER_FLUSH_ROWS}")
+    print(f"{'usul':22} {'user/s':>9} {'commit':>7} {'commit/s':>9} {'p50, ms':>9} {'p99, ms':>9} {'max, ms':>9}")
+    for name, r in res.items():
+        print(f"{name:22} {r['users_per_s']:9.0f} {r['commits']:7d} {r['commits_per_s']:9.1f} "
+              f"{r['p50_ms']:9.3f} {r['p99_ms']:9.3f} {r['max_ms']:9.3f}")
+    lost = [name for name, r in res.items() if r["stored"] != args.users]
+    if lost:
+        print("XATO: barcha foydalanuvchilar yozilmadi: " + ", ".join(lost))
+    return 1 if lost else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,75 +3,103 @@ import asyncio
 import os
 
 from aiogram import Bot, Dispatcher
-from aiogram.client.default import DefaultBotProperties
-from aiogram.enums import ParseMode
 
-# .env ni yuklaymiz (lokal ishga tushirish uchun)
-try:
-    from dotenv import load_dotenv
-    load_dotenv()
-except Exception:
-    pass
+# .env config.py'da yuklanadi — db/handlers env'ni import paytida o‘qigani uchun birinchi
+import config
 
 # Routerlar
 from handlers.start import start_router
 from handlers.admin import admin_router
+from handlers.join_requests import join_router
 
 # DB init
-from db import init_db, bootstrap_super_admin
+from db import init_db, close_db, bootstrap_super_admin
+from utils.broadcast import resume_broadcasts, stop_broadcasts
+from utils.approver import start_approver, stop_approver
+from utils import metrics
+from utils.fsm_storage import SQLiteStorage
 
 def get_token_and_props():
-    """
-    BOT_TOKEN ni quyidagi tartibda olish:
-    1) .env / OS environment: BOT_TOKEN
-    2) config.py dagi BOT_TOKEN
-    DefaultBotProperties ham config.py dan o‘qiladi, bo‘lmasa HTML qo‘yamiz.
-    """
-    token = os.getenv("BOT_TOKEN")
-
-    default_props = DefaultBotProperties(parse_mode=ParseMode.HTML)
-
-    # config.py bo‘lsa, undan ham o‘qib ko‘ramiz
-    try:
-        import config
-        if not token:
-            token = getattr(config, "BOT_TOKEN", None)
-        cfg_props = getattr(config, "DEFAULT_BOT_PROPERTIES", None)
-        if cfg_props:
-            default_props = cfg_props
-    except Exception:
-        pass
-
-    if not isinstance(token, str) or not token.strip():
+    """BOT_TOKEN va DefaultBotProperties — config.py'dan (.env / OS environment)."""
+    token = config.BOT_TOKEN
+    if not token:
         raise RuntimeError(
             "BOT_TOKEN topilmadi. .env faylingizga BOT_TOKEN=XXXX qo‘ying "
-            "yoki config.py ichida BOT_TOKEN = 'XXXX' bo‘lishi kerak."
+            "yoki OS environment'da bering."
         )
+    return token, config.DEFAULT_BOT_PROPERTIES
 
-    return token, default_props
-
-async def main():
-    # DB jadvallarini yaratamiz
-    await init_db()
-
-    # Token va default parse_mode
+def create_bot() -> Bot:
+    """Bot obyekti; BOT_API_URL berilsa so‘rovlar o‘sha serverga yuboriladi."""
     token, default_props = get_token_and_props()
+    if not config.BOT_API_URL:
+        return Bot(token=token, default=default_props)
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+    session = AiohttpSession(api=TelegramAPIServer.from_base(config.BOT_API_URL))
+    return Bot(token=token, default=default_props, session=session)
 
-    bot = Bot(token=token, default=default_props)
-    dp = Dispatcher()
+def build_dispatcher(storage: SQLiteStorage) -> Dispatcher:
+    dp = Dispatcher(storage=storage)
 
     # Routerlar
     dp.include_router(start_router)
     dp.include_router(admin_router)
+    dp.include_router(join_router)
+    return dp
+
+async def main():
+    # DB jadvallarini yaratamiz
+    await init_db()
 
-    # Agar SUPER_ADMIN_ID environmentda bo‘lsa — bazaga belgilab qo‘yamiz
-    super_id = os.getenv("SUPER_ADMIN_ID")
-    if super_id:
-        # ismi ixtiyoriy, keyin ham o‘zgartirsa bo‘ladi
-        await bootstrap_super_admin(super_id, name="SuperAdmin")
+    # SUPER_ADMIN_ID / BOT_OWNER_ID / OWNER_ID environmentda bo‘lsa — bazaga
+    # belgilab qo‘yamiz (faqat startda; /admin endi hech kimni admin qilmaydi)
+    await bootstrap_super_admin(name="SuperAdmin")
+
+    # BOT_WORKERS>1 — update'lar user_id bo‘yicha bir nechta jarayonga taqsimlanadi
+    workers = int(os.getenv("BOT_WORKERS", "1") or 1)
+    if workers > 1:
+        from cluster import run_front
+        await close_db()
+        return await run_front(workers)
+
+    # Token, default parse_mode va (ixtiyoriy) Bot API server manzili
+    bot = create_bot()
+    # FSM holatlari SQLite'da: restartdan keyin ham saqlanadi
+    storage = SQLiteStorage()
+    dp = build_dispatcher(storage)
+
+    # METRICS_PORT berilsa — Prometheus formatidagi /metrics
+    metrics_runner = None
+    if metrics.METRICS_PORT:
+        metrics.install(dp, bot, storage)
+        metrics_runner = await metrics.start_server()
+
+    # Restartdan oldin tugamay qolgan reklamalarni davom ettiramiz
+    await resume_broadcasts(bot)
+    # auto_approve kanallar uchun join-request navbati
+    start_approver(bot)
+
+    # BOT_MODE=webhook bo‘lsa aiohttp server, aks holda long polling
+    mode = os.getenv("BOT_MODE", "polling").strip().lower()
 
     print("Bot ishga tushdi.")
-    await dp.start_polling(bot)
+    try:
+        if mode == "webhook":
+            from webhook import run_webhook
+            await run_webhook(dp, bot)
+        else:
+            await bot.delete_webhook(drop_pending_updates=False)
+            # sessiyani finally'da yopamiz: approver/reklama to‘xtaguncha API kerak
+            await dp.start_polling(bot, close_bot_session=False)
+    finally:
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await stop_approver()
+        await stop_broadcasts()
+        await bot.session.close()
+        await storage.close()
+        await close_db()
 
 if __name__ == "__main__":
     asyncio.run(main())
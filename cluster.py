@@ -0,0 +1,220 @@
+# cluster.py
+# Ko‘p jarayonli rejim (BOT_WORKERS>1): front jarayon update'larni qabul qiladi
+# (polling yoki webhook) va user_id xeshi bo‘yicha N ta ishchi jarayondan biriga
+# yuboradi. Bitta foydalanuvchining update'lari doim bitta ishchiga tushadi va
+# u yerda ketma-ket ishlanadi — FSM va xabarlar tartibi saqlanadi.
+# Ishchilar bitta SQLite faylini WAL + busy_timeout bilan birga ishlatadi;
+# admin o‘zgarishlari db.sync_caches_forever() orqali boshqa ishchilarga yetadi.
+from __future__ import annotations
+import asyncio
+import hmac
+import json
+import multiprocessing as mp
+import os
+import signal
+from typing import Dict, List, Optional, Set
+
+from aiohttp import ClientError, ClientSession, ClientTimeout, web
+from aiogram import Bot
+from aiogram.types import Update
+
+from bot import create_bot, build_dispatcher
+from db import init_db, close_db, sync_caches_forever
+from utils.broadcast import resume_broadcasts, stop_broadcasts
+from utils.approver import start_approver, stop_approver
+from utils import metrics
+from utils.fsm_storage import SQLiteStorage
+
+WORKER_QUEUE_SIZE = int(os.getenv("WORKER_QUEUE_SIZE", "10000") or 10000)
+WORKER_MAX_INFLIGHT = int(os.getenv("WORKER_MAX_INFLIGHT", "100") or 100)
+POLL_TIMEOUT = 30
+
+
+def user_key(raw: dict) -> int:
+    """Update ichidan foydalanuvchi (bo‘lmasa chat) ID'sini topadi."""
+    for k, v in raw.items():
+        if k == "update_id" or not isinstance(v, dict):
+            continue
+        for field in ("from", "user"):
+            who = v.get(field)
+            if isinstance(who, dict) and "id" in who:
+                return int(who["id"])
+        chat = v.get("chat")
+        if isinstance(chat, dict) and "id" in chat:
+            return int(chat["id"])
+    return 0
+
+
+# ==================== Ishchi jarayon ====================
+def worker_main(idx: int, q: "mp.Queue") -> None:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)   # to‘xtatishni front boshqaradi
+    asyncio.run(_worker(idx, q))
+
+
+async def _worker(idx: int, q: "mp.Queue") -> None:
+    await init_db()
+    bot = create_bot()
+    storage = SQLiteStorage()
+    dp = build_dispatcher(storage)
+    sync = asyncio.create_task(sync_caches_forever())
+    metrics_runner = None
+    if metrics.METRICS_PORT:
+        # har bir ishchi o‘z portida: METRICS_PORT + idx
+        metrics.install(dp, bot, storage)
+        metrics_runner = await metrics.start_server(metrics.METRICS_PORT + idx)
+    if idx == 0:
+        # fon ishlari faqat bitta ishchida
+        await resume_broadcasts(bot)
+        start_approver(bot)
+
+    sem = asyncio.Semaphore(WORKER_MAX_INFLIGHT)
+    tails: Dict[int, asyncio.Task] = {}   # user_id -> shu foydalanuvchining oxirgi task'i
+    tasks: Set[asyncio.Task] = set()
+
+    async def process(update: Update, prev: Optional[asyncio.Task]) -> None:
+        try:
+            if prev is not None and not prev.done():
+                await asyncio.wait({prev})
+            await dp.feed_update(bot, update)
+        except Exception as e:
+            print(f"[worker {idx}] update {update.update_id} xatosi: {e!r}")
+        finally:
+            sem.release()
+
+    def forget(uid: int, task: asyncio.Task) -> None:
+        tasks.discard(task)
+        if tails.get(uid) is task:
+            del tails[uid]
+
+    loop = asyncio.get_running_loop()
+    print(f"Ishchi #{idx} ishga tushdi.")
+    try:
+        while True:
+            raw = await loop.run_in_executor(None, q.get)
+            if raw is None:
+                break
+            uid = user_key(raw)
+            update = Update.model_validate(raw, context={"bot": bot})
+            await sem.acquire()
+            task = asyncio.create_task(process(update, tails.get(uid)))
+            tails[uid] = task
+            tasks.add(task)
+            task.add_done_callback(lambda t, uid=uid: forget(uid, t))
+        if tasks:
+            await asyncio.wait(set(tasks))
+    finally:
+        sync.cancel()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await stop_approver()
+        await stop_broadcasts()
+        await storage.close()
+        await bot.session.close()
+        await close_db()
+
+
+# ==================== Front jarayon ====================
+class _Front:
+    def __init__(self, queues: List["mp.Queue"]):
+        self.queues = queues
+
+    async def route(self, raw: dict) -> None:
+        q = self.queues[abs(user_key(raw)) % len(self.queues)]
+        try:
+            q.put_nowait(raw)
+        except Exception:  # navbat to‘lgan — bo‘shashini kutamiz (backpressure)
+            await asyncio.to_thread(q.put, raw)
+
+    async def poll(self, bot: Bot, allowed: List[str]) -> None:
+        """getUpdates'ni xom JSON ko‘rinishida o‘qiydi — frontda pydantic parse yo‘q."""
+        await bot.delete_webhook(drop_pending_updates=False)
+        url = bot.session.api.api_url(token=bot.token, method="getUpdates")
+        offset = 0
+        async with ClientSession(timeout=ClientTimeout(total=POLL_TIMEOUT + 10)) as http:
+            while True:
+                try:
+                    async with http.post(url, json={"offset": offset, "timeout": POLL_TIMEOUT,
+                                                    "allowed_updates": allowed}) as r:
+                        data = await r.json()
+                    if not isinstance(data, dict):
+                        raise ValueError(f"kutilmagan javob: {data!r:.200}")
+                except (asyncio.TimeoutError, ClientError, OSError, ValueError) as e:
+                    # uzilish, 502 HTML sahifa, buzuq JSON — qayta urinamiz; faqat cancel to‘xtatadi
+                    print(f"[front] getUpdates xatosi: {e!r}")
+                    await asyncio.sleep(1)
+                    continue
+                if not data.get("ok"):
+                    retry = (data.get("parameters") or {}).get("retry_after", 1)
+                    await asyncio.sleep(float(retry))
+                    continue
+                for raw in data.get("result", []):
+                    offset = int(raw["update_id"]) + 1
+                    await self.route(raw)
+
+    async def serve_webhook(self, bot: Bot, allowed: List[str]) -> web.AppRunner:
+        from webhook import (
+            WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBAPP_HOST, WEBAPP_PORT, SECRET_HEADER,
+        )
+
+        async def handle(request: web.Request) -> web.Response:
+            if WEBHOOK_SECRET and not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), WEBHOOK_SECRET):
+                return web.Response(status=401)
+            try:
+                raw = json.loads(await request.read())
+            except ValueError:
+                return web.Response(status=400)
+            await self.route(raw)
+            return web.Response()
+
+        app = web.Application()
+        app.router.add_post(WEBHOOK_PATH, handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, WEBAPP_HOST, WEBAPP_PORT).start()
+        if WEBHOOK_URL:
+            await bot.set_webhook(WEBHOOK_URL + WEBHOOK_PATH, secret_token=WEBHOOK_SECRET or None,
+                                  allowed_updates=allowed)
+        return runner
+
+
+async def run_front(workers: int) -> None:
+    ctx = mp.get_context("spawn")
+    queues = [ctx.Queue(maxsize=WORKER_QUEUE_SIZE) for _ in range(workers)]
+    procs = [ctx.Process(target=worker_main, args=(i, queues[i]), name=f"bot-worker-{i}")
+             for i in range(workers)]
+    for p in procs:
+        p.start()
+
+    bot = create_bot()
+    allowed = build_dispatcher(SQLiteStorage()).resolve_used_update_types()
+    front = _Front(queues)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    mode = os.getenv("BOT_MODE", "polling").strip().lower()
+    runner: Optional[web.AppRunner] = None
+    poller: Optional[asyncio.Task] = None
+    print(f"Bot ishga tushdi ({workers} ishchi, {mode}).")
+    try:
+        if mode == "webhook":
+            runner = await front.serve_webhook(bot, allowed)
+        else:
+            poller = asyncio.create_task(front.poll(bot, allowed))
+            poller.add_done_callback(lambda _t: stop.set())
+        await stop.wait()
+    finally:
+        if poller is not None:
+            poller.cancel()
+        if runner is not None:
+            await runner.cleanup()
+        for q in queues:
+            await asyncio.to_thread(q.put, None)
+        for p in procs:
+            await asyncio.to_thread(p.join)
+        await bot.session.close()
@@ -1,10 +1,15 @@
 # config.py
+# Sozlamalarning yagona manbai: .env shu yerda (bir marta) yuklanadi.
+# bot.py buni db/handlers'dan OLDIN import qiladi — ular env'ni import paytida o'qiydi.
 import os
-from dotenv import load_dotenv
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 
-load_dotenv()  # .env ni yuklaydi
+try:
+    from dotenv import load_dotenv
+    load_dotenv()  # .env ni yuklaydi
+except ImportError:
+    pass
 
 def _parse_admins(val: str) -> set[int]:
     if not val:
@@ -18,14 +23,16 @@ def _parse_admins(val: str) -> set[int]:
             pass
     return out
 
+# bo'sh bo'lsa bot.get_token_and_props() xato beradi (import paytida emas)
 BOT_TOKEN = os.getenv("BOT_TOKEN", "").strip()
-if not BOT_TOKEN:
-    raise RuntimeError("BOT_TOKEN .env da topilmadi!")
 
 ADMINS = _parse_admins(os.getenv("ADMINS", ""))
 SUPER_ADMIN_ID = int(os.getenv("SUPER_ADMIN_ID", "0") or 0)
 
-DB_PATH = os.getenv("DB_PATH", "db.sqlite3")
+DB_PATH = os.getenv("DB_PATH", "data.db")   # db.py bilan bir xil
+
+# O‘z Bot API serveringiz (telegram-bot-api) yoki lokal sinov serveri; bo‘sh — api.telegram.org
+BOT_API_URL = os.getenv("BOT_API_URL", "").strip().rstrip("/")
 
 _parse_mode = os.getenv("PARSE_MODE", "HTML").upper()
 if _parse_mode not in ("HTML", "MARKDOWN", "MARKDOWNV2"):
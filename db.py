@@ -2,9 +2,15 @@
 # Asinxron SQLite helper + bot uchun barcha kerakli CRUD funksiyalar
 
 from __future__ import annotations
+import asyncio
 import os
-from datetime import datetime, timezone
-from typing import Any, Iterable, Optional, Tuple, List
+import sqlite3
+import sys
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, Optional, Set, Tuple, List
 
 import aiosqlite
 
@@ -13,35 +19,273 @@ DB_PATH = os.getenv("DB_PATH", "data.db")
 os.makedirs(os.path.dirname(DB_PATH) or ".", exist_ok=True)
 
 # ============== Ulanish helperlari ==============
-def _connect():
+# Bitta yozuvchi ulanish + kichik read-only pool (WAL). init_db() ochadi,
+# close_db() yopadi. Har so'rovda connect/teardown qilinmaydi.
+READ_POOL_SIZE = max(1, int(os.getenv("DB_READ_POOL", "4") or 4))
+STMT_CACHE_SIZE = 256
+# bir nechta jarayon (cluster rejimi) bitta faylga yozganda kutish vaqti
+BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000") or 5000)
+# DB_PROFILE=1 — har bir so'rov vaqti, sekin so'rovlar logi va SCAN rejalari (pastda)
+DB_PROFILE = os.getenv("DB_PROFILE", "").strip().lower() in ("1", "true", "yes", "on")
+DB_SLOW_MS = float(os.getenv("DB_SLOW_MS", "50") or 50)
+
+_writer: Optional[aiosqlite.Connection] = None
+_readers: Optional[asyncio.Queue] = None
+_reader_conns: List[aiosqlite.Connection] = []
+_write_lock = asyncio.Lock()
+_open_lock = asyncio.Lock()
+
+def _connect(readonly: bool = False):
     """
     aiosqlite connect obyektini qaytaradi (await QILMAYMIZ).
-    Foydalanish:  async with _connect() as db:
+    readonly=True bo'lsa fayl `mode=ro` bilan ochiladi.
     """
-    return aiosqlite.connect(DB_PATH)
+    if readonly:
+        uri = f"file:{os.path.abspath(DB_PATH)}?mode=ro"
+        return aiosqlite.connect(uri, uri=True, cached_statements=STMT_CACHE_SIZE)
+    return aiosqlite.connect(DB_PATH, cached_statements=STMT_CACHE_SIZE)
 
 async def _prepare(db: aiosqlite.Connection) -> None:
     await db.execute("PRAGMA journal_mode=WAL;")
     await db.execute("PRAGMA synchronous=NORMAL;")
     await db.execute("PRAGMA foreign_keys=ON;")
+    await db.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS};")
+
+async def open_db() -> None:
+    """Yozuvchi ulanish va read pool'ni bir marta ochadi (takroriy chaqiruv — no-op)."""
+    global _writer, _readers
+    if _writer is not None:
+        return
+    async with _open_lock:
+        if _writer is not None:
+            return
+        writer = await _connect()
+        await _prepare(writer)
+        await writer.commit()
+        # o'quvchilar yozuvchidan keyin (fayl va WAL tayyor), o'zaro parallel
+        conns = await asyncio.gather(*(_open_reader() for _ in range(READ_POOL_SIZE)))
+        readers: asyncio.Queue = asyncio.Queue()
+        for conn in conns:
+            _reader_conns.append(conn)
+            readers.put_nowait(conn)
+        _writer, _readers = writer, readers
+
+async def _open_reader() -> aiosqlite.Connection:
+    conn = await _connect(readonly=True)
+    await conn.execute("PRAGMA foreign_keys=ON;")
+    await conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS};")
+    return conn
+
+async def close_db() -> None:
+    """Shutdown paytida navbatni yozib, barcha ulanishlarni yopadi."""
+    global _writer, _readers
+    await _stop_user_writer()
+    async with _write_lock:
+        for conn in _reader_conns:
+            try:
+                await conn.close()
+            except Exception:
+                pass
+        _reader_conns.clear()
+        if _writer is not None:
+            try:
+                await _writer.commit()
+            finally:
+                await _writer.close()
+        _writer, _readers = None, None
+
+# ============== Vaqt o'lchash ilgagi ==============
+# utils/metrics.py o'rnatadi: observer(caller, "read"|"write", sekund).
+# caller — _tx()/_read()'ni chaqirgan db funksiyasi (_exec/_fetch* o'tkazib yuboriladi).
+# O'rnatilmagan bo'lsa hech narsa o'lchanmaydi.
+_db_observer: Optional[Callable[[str, str, float], None]] = None
+_HELPER_FRAMES = frozenset({"_exec", "_fetchall", "_fetchone", "_fetchval", "__aenter__",
+                            "_stat", "execute", "executemany"})
+
+def set_db_observer(fn: Optional[Callable[[str, str, float], None]]) -> None:
+    global _db_observer
+    _db_observer = fn
+
+def _caller() -> str:
+    f = sys._getframe(2)     # _caller <- _tx/_read <- __aenter__ <- ...
+    while f is not None and f.f_code.co_name in _HELPER_FRAMES:
+        f = f.f_back
+    return f.f_code.co_name if f is not None else "?"
+
+# ============== So'rov profili (DB_PROFILE) ==============
+# Ulanish proxy orqali beriladi: har bir execute/executemany (va fetch) vaqti
+# (chaqiruvchi funksiya, normallashgan SQL) bo'yicha yig'iladi. Yangi so'rov
+# birinchi marta kelganda EXPLAIN QUERY PLAN olinadi; indekssiz to'liq jadval
+# skani (USING'siz SCAN) bo'lsa logga yoziladi. Hisobot: profile_report() va admin /dbprof.
+@dataclass
+class _QueryStat:
+    sql: str
+    caller: str
+    calls: int = 0
+    total: float = 0.0
+    worst: float = 0.0
+    scan: Optional[str] = None       # SCAN qatorlari (bo'lsa)
+
+_profile: Dict[Tuple[str, str], _QueryStat] = {}   # (caller, sql) -> stat
+
+def _norm_sql(sql: str) -> str:
+    return " ".join(sql.split())
+
+def _params_shape(params: Any, many: bool = False) -> str:
+    if many:
+        rows = list(params) if not isinstance(params, list) else params
+        first = _params_shape(rows[0]) if rows else "()"
+        return f"{len(rows)} x {first}"
+    return "(" + ", ".join(type(p).__name__ for p in params) + ")"
+
+def _profile_add(st: _QueryStat, dt: float, shape: str) -> None:
+    st.calls += 1
+    st.total += dt
+    st.worst = max(st.worst, dt)
+    if dt * 1000.0 >= DB_SLOW_MS:
+        print(f"[db slow] {dt * 1000.0:.1f} ms {st.caller}: {st.sql[:300]} params={shape}")
+
+def _full_scans(plan: List[str]) -> List[str]:
+    """
+    Indekssiz to'liq skanlar: "SCAN <jadval>" — USING ... INDEX / INTEGER PRIMARY
+    KEY'siz. Sub-query, CTE va co-routine natijalarini aylanish hisobga olinmaydi.
+    """
+    derived = {p.split(None, 1)[1] for p in plan if p.startswith(("CO-ROUTINE ", "MATERIALIZE "))}
+    out = []
+    for p in plan:
+        if not p.startswith("SCAN ") or " USING " in p:
+            continue
+        name = p[5:].strip()
+        if name == "CONSTANT ROW" or name.startswith("(") or name in derived:
+            continue
+        out.append(p)
+    return out
+
+async def _explain(conn: aiosqlite.Connection, st: _QueryStat, params: Tuple) -> None:
+    if st.sql.split(None, 1)[0].upper() not in ("SELECT", "WITH", "UPDATE", "DELETE", "INSERT"):
+        return
+    try:
+        cur = await conn.execute("EXPLAIN QUERY PLAN " + st.sql, params)
+        plan = [str(r[3]) for r in await cur.fetchall()]
+        await cur.close()
+    except Exception:
+        return
+    scans = _full_scans(plan)
+    if scans:
+        st.scan = "; ".join(scans)
+        print(f"[db scan] {st.caller}: {st.sql[:300]}\n    " + "\n    ".join(plan))
+
+class _ProfiledCursor:
+    __slots__ = ("_cur", "_st")
+
+    def __init__(self, cur: aiosqlite.Cursor, st: _QueryStat):
+        self._cur, self._st = cur, st
+
+    async def fetchall(self) -> List[Tuple]:
+        t0 = time.perf_counter()
+        rows = await self._cur.fetchall()
+        self._st.total += time.perf_counter() - t0
+        return rows
+
+    async def fetchone(self) -> Optional[Tuple]:
+        t0 = time.perf_counter()
+        row = await self._cur.fetchone()
+        self._st.total += time.perf_counter() - t0
+        return row
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cur, name)
+
+class _ProfiledConn:
+    __slots__ = ("_conn",)
+
+    def __init__(self, conn: aiosqlite.Connection):
+        self._conn = conn
+
+    async def _stat(self, sql: str, params: Tuple) -> _QueryStat:
+        key = (_caller(), _norm_sql(sql))
+        st = _profile.get(key)
+        if st is None:
+            st = _profile[key] = _QueryStat(key[1], key[0])
+            await _explain(self._conn, st, params)
+        return st
+
+    async def execute(self, sql: str, params: Iterable[Any] = ()) -> _ProfiledCursor:
+        params = tuple(params)
+        st = await self._stat(sql, params)
+        t0 = time.perf_counter()
+        cur = await self._conn.execute(sql, params)
+        _profile_add(st, time.perf_counter() - t0, _params_shape(params))
+        return _ProfiledCursor(cur, st)
+
+    async def executemany(self, sql: str, rows: Iterable[Iterable[Any]]) -> _ProfiledCursor:
+        rows = [tuple(r) for r in rows]
+        st = await self._stat(sql, rows[0] if rows else ())
+        t0 = time.perf_counter()
+        cur = await self._conn.executemany(sql, rows)
+        _profile_add(st, time.perf_counter() - t0, _params_shape(rows, many=True))
+        return _ProfiledCursor(cur, st)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._conn, name)
+
+def profile_report(n: int = 10) -> List[_QueryStat]:
+    """Umumiy vaqt bo'yicha eng og'ir n ta so'rov (DB_PROFILE yoqilgan bo'lsa)."""
+    return sorted(_profile.values(), key=lambda st: st.total, reverse=True)[:n]
+
+def profile_reset() -> None:
+    _profile.clear()
+
+@asynccontextmanager
+async def _tx():
+    """
+    Yozuvchi ulanishda bitta tranzaksiya: muvaffaqiyatda commit, xatoda rollback.
+    Foydalanish:  async with _tx() as db:
+    """
+    obs = _db_observer
+    if obs is not None:
+        who, t0 = _caller(), time.perf_counter()
+    await open_db()
+    try:
+        async with _write_lock:
+            try:
+                yield _ProfiledConn(_writer) if DB_PROFILE else _writer
+                await _writer.commit()
+            except BaseException:
+                await _writer.rollback()
+                raise
+    finally:
+        if obs is not None:
+            obs(who, "write", time.perf_counter() - t0)
+
+@asynccontextmanager
+async def _read():
+    """Read pool'dan ulanish olib, ishdan keyin qaytaradi."""
+    obs = _db_observer
+    if obs is not None:
+        who, t0 = _caller(), time.perf_counter()
+    await open_db()
+    conn = await _readers.get()
+    try:
+        yield _ProfiledConn(conn) if DB_PROFILE else conn
+    finally:
+        _readers.put_nowait(conn)
+        if obs is not None:
+            obs(who, "read", time.perf_counter() - t0)
 
 async def _exec(sql: str, params: Iterable[Any] = ()) -> None:
-    async with _connect() as db:
-        await _prepare(db)
+    async with _tx() as db:
         await db.execute(sql, tuple(params))
-        await db.commit()
 
 async def _fetchall(sql: str, params: Iterable[Any] = ()) -> List[Tuple]:
-    async with _connect() as db:
-        await _prepare(db)
+    async with _read() as db:
         cur = await db.execute(sql, tuple(params))
         rows = await cur.fetchall()
         await cur.close()
         return rows
 
 async def _fetchone(sql: str, params: Iterable[Any] = ()) -> Optional[Tuple]:
-    async with _connect() as db:
-        await _prepare(db)
+    async with _read() as db:
         cur = await db.execute(sql, tuple(params))
         row = await cur.fetchone()
         await cur.close()
@@ -51,10 +295,23 @@ async def _fetchval(sql: str, params: Iterable[Any] = ()) -> Any:
     row = await _fetchone(sql, params)
     return row[0] if row else None
 
-# ============== Dastlabki yaratish ==============
-async def init_db() -> None:
+async def _add_column(db: aiosqlite.Connection, table: str, column: str, ddl: str) -> None:
+    """Eski bazalar uchun: ustun bo'lmasa ALTER TABLE ... ADD COLUMN."""
+    cur = await db.execute(f"PRAGMA table_info({table})")
+    rows = await cur.fetchall()
+    await cur.close()
+    if column not in {r[1] for r in rows}:
+        await db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+# ============== Migratsiyalar ==============
+# PRAGMA user_version — qo'llangan oxirgi migratsiya raqami. migrate() yangi
+# migratsiyalarni tartib bilan bitta BEGIN IMMEDIATE tranzaksiyasida bajaradi:
+# biror qadam yiqilsa, sxema ham, user_version ham o'zgarmaydi. Yangi o'zgarish —
+# MIGRATIONS oxiriga yangi funksiya (eskilarini tahrirlamang).
+async def _m1_baseline(db: aiosqlite.Connection) -> None:
+    """Versiyasiz davrdagi sxema; eski bazalarda IF NOT EXISTS/_add_column no-op."""
     # users
-    await _exec("""
+    await db.execute("""
     CREATE TABLE IF NOT EXISTS users (
         user_id     INTEGER PRIMARY KEY,
         first_name  TEXT,
@@ -63,9 +320,40 @@ async def init_db() -> None:
         joined_at   TEXT
     )
     """)
+    # yetkazish holati: bloklagan/o'chirilgan akkauntlar fan-out'da o'tkazib yuboriladi
+    await _add_column(db, "users", "is_dead", "INTEGER NOT NULL DEFAULT 0")
+    await _add_column(db, "users", "last_ok_at", "TEXT")
+    await _add_column(db, "users", "fail_count", "INTEGER NOT NULL DEFAULT 0")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_users_live ON users(user_id) WHERE is_dead=0")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_users_dead ON users(user_id) WHERE is_dead=1")
+
+    # qo'shilgan vaqt: epoch (INTEGER) + indeks; eski matnli joined_at'dan ko'chiriladi
+    await _add_column(db, "users", "joined_ts", "INTEGER")
+    await db.execute("""
+        UPDATE users
+        SET joined_ts = COALESCE(CAST(strftime('%s', joined_at) AS INTEGER), 0)
+        WHERE joined_ts IS NULL
+    """)
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_users_joined_ts ON users(joined_ts)")
+
+    # kunlik rollup: har INSERT'da trigger orqali oshiriladi
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS user_daily_stats (
+        day    TEXT PRIMARY KEY,            -- YYYY-MM-DD (UTC)
+        joined INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    """)
+    await db.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_users_daily_stats AFTER INSERT ON users
+    BEGIN
+        INSERT INTO user_daily_stats(day, joined)
+        VALUES(date(COALESCE(NEW.joined_ts, 0), 'unixepoch'), 1)
+        ON CONFLICT(day) DO UPDATE SET joined = joined + 1;
+    END
+    """)
 
     # channels
-    await _exec("""
+    await db.execute("""
     CREATE TABLE IF NOT EXISTS channels (
         chat_id     TEXT PRIMARY KEY,
         title       TEXT,
@@ -74,9 +362,38 @@ async def init_db() -> None:
         url         TEXT
     )
     """)
+    # is_join=1 — join-request (zayavka) kanal: kutilayotgan so'rov obuna o'rnida
+    await _add_column(db, "channels", "is_join", "INTEGER NOT NULL DEFAULT 0")
+
+    # join-request'lar: (user, kanal) bo'yicha oxirgi so'rov vaqti
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS join_requests (
+        user_id INTEGER NOT NULL,
+        chat_id TEXT NOT NULL,
+        ts      INTEGER NOT NULL,
+        PRIMARY KEY(user_id, chat_id)
+    ) WITHOUT ROWID
+    """)
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_join_requests_ts ON join_requests(ts)")
+
+    # auto_approve=1 — join-request'lar approve_queue orqali avtomatik tasdiqlanadi
+    await _add_column(db, "channels", "auto_approve", "INTEGER NOT NULL DEFAULT 0")
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS approve_queue (
+        chat_id  TEXT NOT NULL,
+        user_id  INTEGER NOT NULL,
+        ts       INTEGER NOT NULL,                    -- navbatga tushgan vaqt
+        status   TEXT NOT NULL DEFAULT 'pending',     -- pending/ok/fail
+        attempts INTEGER NOT NULL DEFAULT 0,
+        done_ts  INTEGER,
+        PRIMARY KEY(chat_id, user_id)
+    ) WITHOUT ROWID
+    """)
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_approve_pending ON approve_queue(ts) WHERE status='pending'")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_approve_done ON approve_queue(done_ts) WHERE done_ts IS NOT NULL")
 
     # buttons (nested)
-    await _exec("""
+    await db.execute("""
     CREATE TABLE IF NOT EXISTS buttons (
         id        INTEGER PRIMARY KEY AUTOINCREMENT,
         parent_id INTEGER NULL,
@@ -87,7 +404,7 @@ async def init_db() -> None:
     """)
 
     # button_contents
-    await _exec("""
+    await db.execute("""
     CREATE TABLE IF NOT EXISTS button_contents (
         id         INTEGER PRIMARY KEY AUTOINCREMENT,
         button_id  INTEGER NOT NULL,
@@ -99,7 +416,7 @@ async def init_db() -> None:
     """)
 
     # settings (kv)
-    await _exec("""
+    await db.execute("""
     CREATE TABLE IF NOT EXISTS settings (
         key   TEXT PRIMARY KEY,
         value TEXT
@@ -107,7 +424,7 @@ async def init_db() -> None:
     """)
 
     # admins
-    await _exec("""
+    await db.execute("""
     CREATE TABLE IF NOT EXISTS admins (
         user_id  INTEGER PRIMARY KEY,
         name     TEXT,
@@ -115,72 +432,411 @@ async def init_db() -> None:
     )
     """)
 
+    # broadcasts (reklama ishlari) + har bir foydalanuvchi bo'yicha holat
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS broadcasts (
+        id              INTEGER PRIMARY KEY AUTOINCREMENT,
+        from_chat_id    INTEGER NOT NULL,
+        message_id      INTEGER NOT NULL,
+        admin_chat_id   INTEGER NOT NULL,
+        progress_msg_id INTEGER,
+        status          TEXT NOT NULL DEFAULT 'running',   -- running/done
+        total           INTEGER NOT NULL DEFAULT 0,
+        created_at      TEXT,
+        finished_at     TEXT
+    )
+    """)
+
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS broadcast_deliveries (
+        broadcast_id INTEGER NOT NULL,
+        user_id      INTEGER NOT NULL,
+        status       TEXT NOT NULL DEFAULT 'pending',      -- pending/ok/fail/dead
+        PRIMARY KEY(broadcast_id, user_id),
+        FOREIGN KEY(broadcast_id) REFERENCES broadcasts(id) ON DELETE CASCADE
+    ) WITHOUT ROWID
+    """)
+
+    # rollup'ni bir marta mavjud foydalanuvchilardan to'ldiramiz
+    cur = await db.execute("SELECT 1 FROM settings WHERE key='daily_stats_ready'")
+    if await cur.fetchone() is None:
+        await db.execute("DELETE FROM user_daily_stats")
+        await db.execute("""
+            INSERT INTO user_daily_stats(day, joined)
+            SELECT date(joined_ts, 'unixepoch'), COUNT(*) FROM users GROUP BY 1
+        """)
+        await db.execute("INSERT INTO settings(key, value) VALUES('daily_stats_ready', '1')")
+    await cur.close()
+
+    # FSM holatlari (utils/fsm_storage.SQLiteStorage)
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS fsm_states (
+        key        TEXT PRIMARY KEY,   -- bot:chat:user:thread:business:destiny
+        state      TEXT,
+        data       TEXT,               -- JSON
+        updated_at INTEGER NOT NULL
+    ) WITHOUT ROWID
+    """)
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_fsm_updated ON fsm_states(updated_at)")
+
     # default
-    if await _fetchval("SELECT value FROM settings WHERE key='menu_cols'") is None:
-        await _exec("INSERT INTO settings(key, value) VALUES('menu_cols', '2')")
+    await db.execute("INSERT OR IGNORE INTO settings(key, value) VALUES('menu_cols', '2')")
+
+async def _m2_nav_indexes(db: aiosqlite.Connection) -> None:
+    """Navigatsiya va ON DELETE CASCADE yo'llari uchun indekslar; aka-uka nomlari unikal."""
+    # takroriy nomlar (bir ota-ona ostida) — birinchisidan boshqalariga " #id" qo'shiladi
+    await db.execute("""
+        UPDATE buttons SET title = title || ' #' || id
+        WHERE id NOT IN (SELECT MIN(id) FROM buttons GROUP BY parent_id, title)
+    """)
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_buttons_parent_pos ON buttons(parent_id, pos)")
+    await db.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_buttons_parent_title ON buttons(parent_id, title)")
+    # UNIQUE'da NULL'lar bir-biridan farq qiladi — ildiz darajasi uchun alohida
+    await db.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_buttons_root_title ON buttons(title) WHERE parent_id IS NULL")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_button_contents_button ON button_contents(button_id)")
+
+MIGRATIONS: List[Callable[[aiosqlite.Connection], Awaitable[None]]] = [
+    _m1_baseline,
+    _m2_nav_indexes,
+]
+
+async def _migrate(db, target: Optional[int] = None) -> int:
+    """Ochiq tranzaksiya ichida `target` (standart — oxirgi) versiyagacha olib chiqadi."""
+    target = len(MIGRATIONS) if target is None else target
+    cur = await db.execute("PRAGMA user_version")
+    version = int((await cur.fetchone())[0])
+    await cur.close()
+    if version >= target:
+        return version
+    for n in range(version + 1, target + 1):
+        await MIGRATIONS[n - 1](db)
+        await db.execute(f"PRAGMA user_version={n}")
+    await db.execute("ANALYZE")
+    return target
+
+async def migrate(target: Optional[int] = None) -> int:
+    """Bazani `target` versiyagacha olib chiqadi; yangi versiyani qaytaradi."""
+    async with _tx() as db:
+        await db.execute("BEGIN IMMEDIATE")   # bir nechta jarayon bo'lsa — navbat bilan
+        return await _migrate(db, target)
+
+# ============== Dastlabki yaratish ==============
+async def init_db() -> None:
+    """Sovuq start: sxema + tozalash + cache_rev bitta tranzaksiyada, keyin keshlar parallel."""
+    global _seen_rev
+    await open_db()
+    async with _tx() as db:
+        await db.execute("BEGIN IMMEDIATE")   # bir nechta jarayon bo'lsa — navbat bilan
+        await _migrate(db)
+        await _prune_join_requests(db)
+        cur = await db.execute("SELECT value FROM settings WHERE key='cache_rev'")
+        row = await cur.fetchone()
+        await cur.close()
+        _seen_rev = row[0] if row else None
+
+    await asyncio.gather(reload_button_tree(), load_admins())
 
 # ============== Users ==============
-async def upsert_user(u) -> None:
-    now_iso = datetime.now(timezone.utc).isoformat()
-    await _exec("""
-    INSERT INTO users(user_id, first_name, last_name, username, joined_at)
-    VALUES(?, ?, ?, ?, ?)
+_UPSERT_USER_SQL = """
+    INSERT INTO users(user_id, first_name, last_name, username, joined_at, joined_ts)
+    VALUES(?, ?, ?, ?, ?, ?)
     ON CONFLICT(user_id) DO UPDATE SET
         first_name=excluded.first_name,
         last_name =excluded.last_name,
-        username  =excluded.username
-    """, (
+        username  =excluded.username,
+        is_dead   =0,
+        fail_count=0
+"""
+
+def _user_row(u) -> Tuple:
+    now = datetime.now(timezone.utc)
+    return (
         int(u.id),
         getattr(u, "first_name", None),
         getattr(u, "last_name", None),
         getattr(u, "username", None),
-        now_iso
-    ))
+        now.isoformat(),
+        int(now.timestamp()),
+    )
+
+async def upsert_user(u) -> None:
+    await _exec(_UPSERT_USER_SQL, _user_row(u))
+
+# ---- write-behind: /start kutmasdan navbatga qo'yadi, fon vazifasi jamlab yozadi ----
+USER_FLUSH_MS = int(os.getenv("USER_FLUSH_MS", "200") or 200)
+USER_FLUSH_ROWS = int(os.getenv("USER_FLUSH_ROWS", "500") or 500)
+
+_user_buf: Dict[int, Tuple] = {}     # user_id -> oxirgi qator (bir xil ID birlashadi)
+_user_flush_evt: Optional[asyncio.Event] = None
+_user_task: Optional[asyncio.Task] = None
+
+def queue_user_upsert(u) -> None:
+    """upsert_user'ning kutilmaydigan varianti: USER_FLUSH_MS yoki USER_FLUSH_ROWS bo'yicha yoziladi."""
+    global _user_flush_evt, _user_task
+    row = _user_row(u)
+    prev = _user_buf.get(row[0])
+    if prev is not None:
+        row = row[:4] + prev[4:]     # birinchi ko'rilgan vaqt saqlansin
+    _user_buf[row[0]] = row
+    if _user_task is None or _user_task.done():
+        _user_flush_evt = asyncio.Event()
+        _user_task = asyncio.create_task(_user_writer_loop(), name="db-user-writer")
+    if len(_user_buf) >= USER_FLUSH_ROWS:
+        _user_flush_evt.set()
+
+async def flush_users() -> int:
+    """Navbatdagi barcha foydalanuvchilarni bitta tranzaksiyada yozadi."""
+    if not _user_buf:
+        return 0
+    batch = list(_user_buf.values())
+    _user_buf.clear()
+    try:
+        async with _tx() as db:
+            await db.executemany(_UPSERT_USER_SQL, batch)
+    except BaseException:
+        for row in batch:               # keyingi urinishda qayta yoziladi
+            _user_buf.setdefault(row[0], row)
+        raise
+    return len(batch)
+
+async def _user_writer_loop() -> None:
+    while True:
+        try:
+            await asyncio.wait_for(_user_flush_evt.wait(), USER_FLUSH_MS / 1000)
+        except asyncio.TimeoutError:
+            pass
+        _user_flush_evt.clear()
+        try:
+            await flush_users()
+        except Exception as e:
+            print(f"[db] users flush xatosi: {e!r}")
+
+async def _stop_user_writer() -> None:
+    global _user_task
+    if _user_task is not None:
+        _user_task.cancel()
+        try:
+            await _user_task
+        except (asyncio.CancelledError, Exception):
+            pass
+        _user_task = None
+    if _writer is not None:
+        await flush_users()
+
+async def user_stats(now_ts: Optional[int] = None) -> dict:
+    """
+    Bitta so'rov: jami/7 kun/30 kun — user_daily_stats rollup'dan (kunlar
+    soni bo'yicha, foydalanuvchilar soniga bog'liq emas), 24 soat —
+    idx_users_joined_ts oralig'idan, bloklaganlar — idx_users_dead'dan.
+    7/30 kun bugungi kunni ham qo'shib, UTC kalendar kunlari bo'yicha.
+    """
+    now_ts = int(now_ts if now_ts is not None else datetime.now(timezone.utc).timestamp())
+    row = await _fetchone("""
+        SELECT
+            (SELECT COALESCE(SUM(joined), 0) FROM user_daily_stats),
+            (SELECT COUNT(*) FROM users WHERE joined_ts >= ?),
+            (SELECT COALESCE(SUM(joined), 0) FROM user_daily_stats WHERE day > date(?, 'unixepoch', '-7 days')),
+            (SELECT COALESCE(SUM(joined), 0) FROM user_daily_stats WHERE day > date(?, 'unixepoch', '-30 days')),
+            (SELECT COUNT(*) FROM users WHERE is_dead=1)
+    """, (now_ts - 86400, now_ts, now_ts))
+    total, d1, d7, d30, dead = (int(v or 0) for v in row)
+    return {"total": total, "d1": d1, "d7": d7, "d30": d30,
+            "live": max(0, total - dead), "dead": dead}
 
-async def count_users_range(since_iso: Optional[str]) -> int:
-    if not since_iso:
-        v = await _fetchval("SELECT COUNT(*) FROM users")
+async def user_daily_series(days: int = 7, now_ts: Optional[int] = None) -> List[Tuple[str, int]]:
+    """Oxirgi `days` kun bo'yicha (kun, yangi foydalanuvchilar), bo'sh kunlar 0 bilan."""
+    now_ts = int(now_ts if now_ts is not None else datetime.now(timezone.utc).timestamp())
+    rows = await _fetchall("""
+        SELECT day, joined FROM user_daily_stats
+        WHERE day > date(?, 'unixepoch', ?)
+    """, (now_ts, f"-{int(days)} days"))
+    got = {str(r[0]): int(r[1]) for r in rows}
+    today = datetime.fromtimestamp(now_ts, timezone.utc).date()
+    out = []
+    for i in range(int(days) - 1, -1, -1):
+        d = (today - timedelta(days=i)).isoformat()
+        out.append((d, got.get(d, 0)))
+    return out
+
+USER_EXPORT_COLUMNS = ("user_id", "first_name", "last_name", "username", "joined_at")
+
+def iter_users_sync(chunk: int = 2000) -> Iterator[List[Tuple]]:
+    """
+    Eksport uchun: alohida (read-only, sinxron) ulanishda kursordan bo'laklab
+    o'qiydi. Event loop'ni band qilmaslik uchun worker thread'da chaqiriladi.
+    """
+    uri = f"file:{os.path.abspath(DB_PATH)}?mode=ro"
+    conn = sqlite3.connect(uri, uri=True)
+    try:
+        cur = conn.execute(f"""
+            SELECT {", ".join(USER_EXPORT_COLUMNS)}
+            FROM users
+            ORDER BY joined_ts DESC
+        """)
+        while True:
+            rows = cur.fetchmany(chunk)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+# Ketma-ket shuncha xatodan keyin foydalanuvchi "o'lik" deb belgilanadi
+DEAD_AFTER_FAILS = 5
+
+_DELIVERY_SQL = {
+    "ok":   "UPDATE users SET last_ok_at=?, fail_count=0, is_dead=0 WHERE user_id=?",
+    "dead": "UPDATE users SET is_dead=1, fail_count=fail_count+1 WHERE user_id=?",
+    "fail": f"""UPDATE users SET fail_count=fail_count+1,
+                    is_dead=CASE WHEN fail_count+1>={DEAD_AFTER_FAILS} THEN 1 ELSE is_dead END
+                WHERE user_id=?""",
+}
+
+async def _apply_delivery_outcomes(db: aiosqlite.Connection, results: List[Tuple[int, str]]) -> None:
+    now_iso = datetime.now(timezone.utc).isoformat()
+    for status, sql in _DELIVERY_SQL.items():
+        if status == "ok":
+            args = [(now_iso, uid) for uid, st in results if st == "ok"]
+        else:
+            args = [(uid,) for uid, st in results if st == status]
+        if args:
+            await db.executemany(sql, args)
+
+async def set_user_dead(user_id: int, dead: bool = True) -> None:
+    if dead:
+        await _exec("UPDATE users SET is_dead=1 WHERE user_id=?", (int(user_id),))
     else:
-        v = await _fetchval("SELECT COUNT(*) FROM users WHERE joined_at >= ?", (since_iso,))
-    return int(v or 0)
+        await _exec("UPDATE users SET is_dead=0, fail_count=0 WHERE user_id=?", (int(user_id),))
 
-async def fetch_all_users() -> List[Tuple]:
-    return await _fetchall("""
-        SELECT user_id, first_name, last_name, username, joined_at
-        FROM users
-        ORDER BY joined_at DESC
-    """)
+# ============== Broadcasts ==============
+async def create_broadcast(from_chat_id: int, message_id: int, admin_chat_id: int) -> int:
+    """Ish yaratadi va barcha foydalanuvchilarni 'pending' qilib yozib qo'yadi."""
+    now_iso = datetime.now(timezone.utc).isoformat()
+    async with _tx() as db:
+        cur = await db.execute(
+            "INSERT INTO broadcasts(from_chat_id, message_id, admin_chat_id, created_at) VALUES(?, ?, ?, ?)",
+            (int(from_chat_id), int(message_id), int(admin_chat_id), now_iso)
+        )
+        bid = cur.lastrowid
+        cur = await db.execute(
+            "INSERT INTO broadcast_deliveries(broadcast_id, user_id) SELECT ?, user_id FROM users WHERE is_dead=0",
+            (bid,)
+        )
+        await db.execute("UPDATE broadcasts SET total=? WHERE id=?", (cur.rowcount or 0, bid))
+        return bid
 
-async def fetch_all_user_ids() -> List[int]:
-    rows = await _fetchall("SELECT user_id FROM users")
+async def get_broadcast(broadcast_id: int) -> Optional[Tuple]:
+    return await _fetchone("""
+        SELECT id, from_chat_id, message_id, admin_chat_id, progress_msg_id, status, total
+        FROM broadcasts WHERE id=?
+    """, (int(broadcast_id),))
+
+async def list_unfinished_broadcasts() -> List[int]:
+    rows = await _fetchall("SELECT id FROM broadcasts WHERE status='running' ORDER BY id ASC")
     return [int(r[0]) for r in rows]
 
+async def set_broadcast_progress_msg(broadcast_id: int, message_id: Optional[int]) -> None:
+    await _exec("UPDATE broadcasts SET progress_msg_id=? WHERE id=?", (message_id, int(broadcast_id)))
+
+async def finish_broadcast(broadcast_id: int) -> None:
+    now_iso = datetime.now(timezone.utc).isoformat()
+    await _exec("UPDATE broadcasts SET status='done', finished_at=? WHERE id=?", (now_iso, int(broadcast_id)))
+
+async def fetch_pending_deliveries(broadcast_id: int, after_user_id: int, limit: int = 500) -> List[int]:
+    rows = await _fetchall("""
+        SELECT user_id FROM broadcast_deliveries
+        WHERE broadcast_id=? AND user_id>? AND status='pending'
+        ORDER BY user_id ASC LIMIT ?
+    """, (int(broadcast_id), int(after_user_id), int(limit)))
+    return [int(r[0]) for r in rows]
+
+async def mark_deliveries(broadcast_id: int, results: Iterable[Tuple[int, str]]) -> None:
+    """
+    results: (user_id, 'ok'|'fail'|'dead') juftliklari — yetkazish holati va
+    users jadvalidagi jonlilik ustunlari bitta tranzaksiyada yoziladi.
+    """
+    res = [(int(uid), status) for uid, status in results]
+    if not res:
+        return
+    async with _tx() as db:
+        await db.executemany(
+            "UPDATE broadcast_deliveries SET status=? WHERE broadcast_id=? AND user_id=?",
+            [(status, int(broadcast_id), uid) for uid, status in res]
+        )
+        await _apply_delivery_outcomes(db, res)
+
+async def broadcast_counts(broadcast_id: int) -> dict:
+    rows = await _fetchall("""
+        SELECT status, COUNT(*) FROM broadcast_deliveries
+        WHERE broadcast_id=? GROUP BY status
+    """, (int(broadcast_id),))
+    out = {"pending": 0, "ok": 0, "fail": 0, "dead": 0}
+    for status, n in rows:
+        out[str(status)] = int(n)
+    return out
+
+# ============== FSM storage ==============
+async def fsm_load(key: str) -> Optional[Tuple[Optional[str], Optional[str], int]]:
+    """(state, data_json, updated_at) yoki None."""
+    row = await _fetchone("SELECT state, data, updated_at FROM fsm_states WHERE key=?", (key,))
+    return (row[0], row[1], int(row[2] or 0)) if row else None
+
+async def fsm_save_many(rows: Iterable[Tuple[str, Optional[str], Optional[str], int]],
+                        deleted: Iterable[str] = ()) -> None:
+    """(key, state, data_json, updated_at) qatorlarini yozadi, `deleted` kalitlarini o'chiradi — bitta tranzaksiyada."""
+    rows = list(rows)
+    deleted = [(k,) for k in deleted]
+    if not rows and not deleted:
+        return
+    async with _tx() as db:
+        if rows:
+            await db.executemany("""
+                INSERT INTO fsm_states(key, state, data, updated_at) VALUES(?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    state=excluded.state, data=excluded.data, updated_at=excluded.updated_at
+            """, rows)
+        if deleted:
+            await db.executemany("DELETE FROM fsm_states WHERE key=?", deleted)
+
+async def fsm_expire(before_ts: int) -> int:
+    async with _tx() as db:
+        cur = await db.execute("DELETE FROM fsm_states WHERE updated_at < ?", (int(before_ts),))
+        return cur.rowcount or 0
+
 # ============== Channels ==============
 async def save_channel(chat_id: str,
                        title: Optional[str],
                        username: Optional[str],
                        invite_link: Optional[str],
-                       url: Optional[str]) -> None:
+                       url: Optional[str],
+                       is_join: bool = False) -> None:
     await _exec("""
-    INSERT INTO channels(chat_id, title, username, invite_link, url)
-    VALUES(?, ?, ?, ?, ?)
+    INSERT INTO channels(chat_id, title, username, invite_link, url, is_join)
+    VALUES(?, ?, ?, ?, ?, ?)
     ON CONFLICT(chat_id) DO UPDATE SET
         title       = excluded.title,
         username    = excluded.username,
         invite_link = excluded.invite_link,
-        url         = excluded.url
-    """, (str(chat_id), title, username, invite_link, url))
+        url         = excluded.url,
+        is_join     = excluded.is_join
+    """, (str(chat_id), title, username, invite_link, url, 1 if is_join else 0))
 
 async def remove_channel(chat_id: str) -> int:
-    async with _connect() as db:
-        await _prepare(db)
+    async with _tx() as db:
         cur = await db.execute("DELETE FROM channels WHERE chat_id=?", (str(chat_id),))
-        await db.commit()
         return cur.rowcount or 0
 
-async def list_channels_full() -> List[Tuple[str, Optional[str], Optional[str], Optional[str], Optional[str]]]:
+async def set_channel_join(chat_id: str, on: bool) -> int:
+    """is_join'ni almashtiradi (oddiy kanalda avto-tasdiqlash ham o'chadi)."""
+    async with _tx() as db:
+        cur = await db.execute(
+            "UPDATE channels SET is_join=?, auto_approve=CASE WHEN ? THEN auto_approve ELSE 0 END WHERE chat_id=?",
+            (1 if on else 0, 1 if on else 0, str(chat_id)))
+        return cur.rowcount or 0
+
+async def list_channels_full() -> List[Tuple[str, Optional[str], Optional[str], Optional[str], Optional[str], int, int]]:
     return await _fetchall("""
-        SELECT chat_id, title, username, invite_link, url
+        SELECT chat_id, title, username, invite_link, url, is_join, auto_approve
         FROM channels
         ORDER BY ROWID ASC
     """)
@@ -189,7 +845,214 @@ async def list_channels() -> List[str]:
     rows = await _fetchall("SELECT chat_id FROM channels ORDER BY ROWID ASC")
     return [str(r[0]) for r in rows]
 
+# ============== Join-request'lar ==============
+# Kutilayotgan so'rov JOIN_REQUEST_TTL soniya davomida join-request kanal
+# uchun obuna hisoblanadi; eskilarini prune_join_requests() o'chiradi — startda
+# (init_db) va ishlash davomida utils/approver.py'ning soatlik tozalashida.
+JOIN_REQUEST_TTL = int(os.getenv("JOIN_REQUEST_TTL", str(7 * 86400)) or 7 * 86400)
+
+async def add_join_request(user_id: int, chat_id: str, ts: Optional[int] = None) -> bool:
+    """
+    So'rovni saqlaydi; kanal auto_approve bo'lsa approve_queue'ga ham qo'yadi.
+    Navbatdagi (pending) takror so'rov qayta qo'shilmaydi. True — navbatga tushdi.
+    """
+    uid, cid = int(user_id), str(chat_id)
+    ts = int(ts if ts is not None else datetime.now(timezone.utc).timestamp())
+    async with _tx() as db:
+        await db.execute("""
+            INSERT INTO join_requests(user_id, chat_id, ts) VALUES(?, ?, ?)
+            ON CONFLICT(user_id, chat_id) DO UPDATE SET ts=excluded.ts
+        """, (uid, cid, ts))
+        cur = await db.execute("""
+            INSERT INTO approve_queue(chat_id, user_id, ts)
+            SELECT ?, ?, ? WHERE EXISTS (SELECT 1 FROM channels WHERE chat_id=? AND auto_approve=1)
+            ON CONFLICT(chat_id, user_id) DO UPDATE SET
+                ts=excluded.ts, status='pending', attempts=0, done_ts=NULL
+            WHERE status != 'pending'
+        """, (cid, uid, ts, cid))
+        return (cur.rowcount or 0) > 0
+
+async def pending_join_chats(user_id: int) -> Set[str]:
+    rows = await _fetchall(
+        "SELECT chat_id FROM join_requests WHERE user_id=? AND ts >= ?",
+        (int(user_id), int(datetime.now(timezone.utc).timestamp()) - JOIN_REQUEST_TTL)
+    )
+    return {str(r[0]) for r in rows}
+
+async def _prune_join_requests(db: aiosqlite.Connection, before_ts: Optional[int] = None) -> int:
+    """Ochiq tranzaksiya ichida: before_ts (standart — JOIN_REQUEST_TTL oldin)dan eskilarini o'chiradi."""
+    if before_ts is None:
+        before_ts = int(datetime.now(timezone.utc).timestamp()) - JOIN_REQUEST_TTL
+    cur = await db.execute("DELETE FROM join_requests WHERE ts < ?", (int(before_ts),))
+    return cur.rowcount or 0
+
+async def prune_join_requests(before_ts: Optional[int] = None) -> int:
+    async with _tx() as db:
+        return await _prune_join_requests(db, before_ts)
+
+# ============== Avto-tasdiqlash navbati ==============
+# utils/approver.py o'qiydi. Bajarilganlar (ok/fail) done_ts bilan qoladi —
+# tezlik statistikasi shulardan hisoblanadi, keyin prune_approvals() o'chiradi.
+APPROVE_MAX_ATTEMPTS = 3
+
+async def set_channel_auto_approve(chat_id: str, on: bool) -> int:
+    async with _tx() as db:
+        cur = await db.execute("UPDATE channels SET auto_approve=? WHERE chat_id=?",
+                               (1 if on else 0, str(chat_id)))
+        return cur.rowcount or 0
+
+async def fetch_approvals(limit: int = 100) -> List[Tuple[str, int]]:
+    return await _fetchall("""
+        SELECT chat_id, user_id FROM approve_queue
+        WHERE status='pending'
+        ORDER BY ts
+        LIMIT ?
+    """, (int(limit),))
+
+async def mark_approvals(results: List[Tuple[str, int, str]]) -> None:
+    """results: (chat_id, user_id, 'ok'|'fail'|'retry'). retry — attempts oshadi, oxirida fail."""
+    if not results:
+        return
+    now_ts = int(datetime.now(timezone.utc).timestamp())
+    done = [(st, now_ts, str(c), int(u)) for c, u, st in results if st != "retry"]
+    retry = [(APPROVE_MAX_ATTEMPTS, now_ts, str(c), int(u)) for c, u, st in results if st == "retry"]
+    async with _tx() as db:
+        if done:
+            await db.executemany(
+                "UPDATE approve_queue SET status=?, done_ts=? WHERE chat_id=? AND user_id=?", done)
+        if retry:
+            await db.executemany("""
+                UPDATE approve_queue SET
+                    attempts = attempts + 1,
+                    status   = CASE WHEN attempts + 1 >= ?1 THEN 'fail' ELSE status END,
+                    done_ts  = CASE WHEN attempts + 1 >= ?1 THEN ?2 ELSE done_ts END
+                WHERE chat_id=?3 AND user_id=?4
+            """, retry)
+
+async def approve_queue_stats(now_ts: Optional[int] = None) -> dict:
+    now_ts = int(now_ts if now_ts is not None else datetime.now(timezone.utc).timestamp())
+    row = await _fetchone("""
+        SELECT
+            (SELECT COUNT(*) FROM approve_queue WHERE status='pending'),
+            COUNT(CASE WHEN status='ok' AND done_ts >= ?1 - 60 THEN 1 END),
+            COUNT(CASE WHEN status='ok' THEN 1 END),
+            COUNT(CASE WHEN status='fail' THEN 1 END)
+        FROM approve_queue
+        WHERE done_ts >= ?1 - 3600
+    """, (now_ts,))
+    pending, ok_1m, ok_1h, fail_1h = row
+    return {"pending": pending, "ok_1m": ok_1m, "ok_1h": ok_1h, "fail_1h": fail_1h}
+
+async def prune_approvals(before_ts: int) -> int:
+    async with _tx() as db:
+        cur = await db.execute("DELETE FROM approve_queue WHERE done_ts < ?", (int(before_ts),))
+        return cur.rowcount or 0
+
+# ============== Xotiradagi keshlar sinxroni ==============
+# Admin o'zgarishlari settings.cache_rev'ni oshiradi. Bir nechta jarayon
+# ishlaganda (cluster.py) har biri shu qiymatni davriy tekshirib, o'zgargan
+# bo'lsa xotiradagi keshlarni (daraxt, menu_cols, ...) qayta yuklaydi.
+_seen_rev: Optional[str] = None
+_cache_gen = 0          # har bir admin o'zgarishida oshadi (masalan, kontent rejalari keshi uchun)
+_reload_hooks: List[Callable[[], Awaitable[None]]] = []
+
+def on_caches_reload(fn: Callable[[], Awaitable[None]]) -> Callable[[], Awaitable[None]]:
+    """Boshqa jarayondagi o'zgarishdan keyin chaqiriladigan hook (dekorator sifatida ham)."""
+    _reload_hooks.append(fn)
+    return fn
+
+def cache_generation() -> int:
+    """Xotiradagi hosila keshlar shu qiymat o'zgarganda tozalanishi kerak."""
+    return _cache_gen
+
+async def _reload_caches() -> None:
+    global _menu_cols, _cache_gen
+    _menu_cols = None
+    _cache_gen += 1
+    await reload_button_tree()
+    await load_admins()
+    for fn in _reload_hooks:
+        await fn()
+
+async def _caches_changed() -> None:
+    """Admin o'zgarishidan keyin: revision'ni oshiradi va shu jarayon keshini yangilaydi."""
+    global _seen_rev, _cache_gen
+    _cache_gen += 1
+    await _exec("""
+        INSERT INTO settings(key, value) VALUES('cache_rev', '1')
+        ON CONFLICT(key) DO UPDATE SET value=CAST(value AS INTEGER) + 1
+    """)
+    _seen_rev = await _fetchval("SELECT value FROM settings WHERE key='cache_rev'")
+    await reload_button_tree()
+
+async def sync_caches_forever(interval: float = 2.0) -> None:
+    """Cluster ishchilari uchun: boshqa jarayonlardagi admin o'zgarishlarini kuzatadi."""
+    global _seen_rev
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            rev = await _fetchval("SELECT value FROM settings WHERE key='cache_rev'")
+            if rev != _seen_rev:
+                _seen_rev = rev
+                await _reload_caches()
+        except Exception as e:
+            print(f"[db] kesh sinxroni xatosi: {e!r}")
+
 # ============== Buttons (nested) ==============
+@dataclass(frozen=True)
+class ButtonTree:
+    """
+    `buttons` jadvalining xotiradagi o'zgarmas nusxasi. Foydalanuvchi
+    navigatsiyasi faqat shundan o'qiydi; admin o'zgarishidan keyin butunlay
+    qayta quriladi va bitta o'zlashtirish bilan almashtiriladi.
+    """
+    children: Dict[Optional[int], Tuple[Tuple[int, str], ...]] = field(default_factory=dict)
+    by_title: Dict[Tuple[Optional[int], str], int] = field(default_factory=dict)
+    parent: Dict[int, Optional[int]] = field(default_factory=dict)
+    version: int = 0
+
+    def list(self, parent_id: Optional[int]) -> Tuple[Tuple[int, str], ...]:
+        return self.children.get(parent_id, ())
+
+    def find(self, parent_id: Optional[int], title: str) -> Optional[Tuple[int, str]]:
+        bid = self.by_title.get((parent_id, title))
+        return (bid, title) if bid is not None else None
+
+    def has_children(self, button_id: int) -> bool:
+        return button_id in self.children
+
+    def parent_of(self, button_id: Optional[int]) -> Optional[int]:
+        if button_id is None:
+            return None
+        return self.parent.get(button_id)
+
+_tree = ButtonTree()
+_tree_lock = asyncio.Lock()
+
+def get_button_tree() -> ButtonTree:
+    return _tree
+
+async def reload_button_tree() -> ButtonTree:
+    """Butun daraxtni bitta so'rov bilan o'qib, indeksni atomar almashtiradi."""
+    global _tree
+    async with _tree_lock:
+        rows = await _fetchall("SELECT id, parent_id, title FROM buttons ORDER BY parent_id, pos ASC")
+        children: Dict[Optional[int], List[Tuple[int, str]]] = {}
+        by_title: Dict[Tuple[Optional[int], str], int] = {}
+        parent: Dict[int, Optional[int]] = {}
+        for r in rows:
+            bid, pid, title = int(r[0]), (int(r[1]) if r[1] is not None else None), str(r[2])
+            children.setdefault(pid, []).append((bid, title))
+            by_title.setdefault((pid, title), bid)
+            parent[bid] = pid
+        _tree = ButtonTree(
+            children={k: tuple(v) for k, v in children.items()},
+            by_title=by_title,
+            parent=parent,
+            version=_tree.version + 1,
+        )
+        return _tree
+
 def _parent_filter(parent_id: Optional[int]) -> Tuple[str, tuple]:
     if parent_id is None:
         return "parent_id IS NULL", tuple()
@@ -200,16 +1063,20 @@ async def _next_pos(parent_id: Optional[int]) -> int:
     v = await _fetchval(f"SELECT MAX(pos) FROM buttons WHERE {clause}", args)
     return (int(v) + 1) if v is not None else 1
 
-async def create_button(title: str, parent_id: Optional[int] = None) -> int:
+async def create_button(title: str, parent_id: Optional[int] = None) -> Optional[int]:
+    """Yangi tugma ID'si; shu ota-ona ostida bu nom band bo'lsa None."""
     pos = await _next_pos(parent_id)
-    async with _connect() as db:
-        await _prepare(db)
-        cur = await db.execute(
-            "INSERT INTO buttons(title, parent_id, pos) VALUES(?, ?, ?)",
-            (title, parent_id, pos)
-        )
-        await db.commit()
-        return cur.lastrowid
+    try:
+        async with _tx() as db:
+            cur = await db.execute(
+                "INSERT INTO buttons(title, parent_id, pos) VALUES(?, ?, ?)",
+                (title, parent_id, pos)
+            )
+            bid = cur.lastrowid
+    except sqlite3.IntegrityError:
+        return None
+    await _caches_changed()
+    return bid
 
 async def list_buttons(parent_id: Optional[int] = None) -> List[Tuple[int, str]]:
     clause, args = _parent_filter(parent_id)
@@ -218,6 +1085,23 @@ async def list_buttons(parent_id: Optional[int] = None) -> List[Tuple[int, str]]
     )
     return [(int(r[0]), str(r[1])) for r in rows]
 
+async def list_button_tree() -> List[Tuple[int, str, int]]:
+    """
+    Butun daraxt bitta WITH RECURSIVE so'rov bilan: (id, title, depth),
+    har bir ota-ona ostida pos tartibida, chuqurlik bo'yicha oldindan (pre-order).
+    """
+    rows = await _fetchall("""
+        WITH RECURSIVE t(id, title, depth, path) AS (
+            SELECT id, title, 0, printf('%08d.%010d', pos, id)
+            FROM buttons WHERE parent_id IS NULL
+            UNION ALL
+            SELECT b.id, b.title, t.depth + 1, t.path || '/' || printf('%08d.%010d', b.pos, b.id)
+            FROM buttons b JOIN t ON b.parent_id = t.id
+        )
+        SELECT id, title, depth FROM t ORDER BY path
+    """)
+    return [(int(r[0]), str(r[1]), int(r[2])) for r in rows]
+
 async def find_button_by_title(parent_id: Optional[int], title: str) -> Optional[Tuple[int, str]]:
     clause, args = _parent_filter(parent_id)
     row = await _fetchone(
@@ -238,40 +1122,53 @@ async def get_button_parent(button_id: Optional[int]) -> Optional[int]:
         return None
     return int(row[0]) if row[0] is not None else None
 
+_menu_cols: Optional[int] = None   # xotiradagi nusxa; set_menu_cols yangilaydi
+
 async def get_menu_cols() -> int:
+    global _menu_cols
+    if _menu_cols is not None:
+        return _menu_cols
     v = await _fetchval("SELECT value FROM settings WHERE key='menu_cols'")
     try:
-        return max(1, min(4, int(v)))
+        _menu_cols = max(1, min(4, int(v)))
     except Exception:
         return 2
+    return _menu_cols
 
 async def set_menu_cols(n: int) -> None:
+    global _menu_cols
     n = max(1, min(4, int(n)))
     await _exec("""
         INSERT INTO settings(key, value) VALUES('menu_cols', ?)
         ON CONFLICT(key) DO UPDATE SET value=excluded.value
     """, (str(n),))
+    _menu_cols = n
+    await _caches_changed()
 
-async def rename_button(button_id: int, new_title: str) -> None:
-    await _exec("UPDATE buttons SET title=? WHERE id=?", (new_title, int(button_id)))
+async def rename_button(button_id: int, new_title: str) -> bool:
+    """False — shu darajada bu nomli boshqa tugma bor."""
+    try:
+        await _exec("UPDATE buttons SET title=? WHERE id=?", (new_title, int(button_id)))
+    except sqlite3.IntegrityError:
+        return False
+    await _caches_changed()
+    return True
 
 async def _resequence_positions(parent_id: Optional[int]) -> None:
     clause, args = _parent_filter(parent_id)
     rows = await _fetchall(f"SELECT id FROM buttons WHERE {clause} ORDER BY pos ASC", args)
-    pos = 1
-    async with _connect() as db:
-        await _prepare(db)
-        for r in rows:
-            bid = int(r[0])
-            await db.execute("UPDATE buttons SET pos=? WHERE id=?", (pos, bid))
-            pos += 1
-        await db.commit()
+    async with _tx() as db:
+        await db.executemany(
+            "UPDATE buttons SET pos=? WHERE id=?",
+            [(pos, int(r[0])) for pos, r in enumerate(rows, 1)]
+        )
 
 async def delete_button(button_id: int) -> None:
     # ON DELETE CASCADE farzandlarni va kontentni o‘chiradi
     parent_id = await get_button_parent(button_id)
     await _exec("DELETE FROM buttons WHERE id=?", (int(button_id),))
     await _resequence_positions(parent_id)
+    await _caches_changed()
 
 async def swap_with_neighbor(button_id: int, up: bool = True) -> None:
     row = await _fetchone("SELECT parent_id, pos FROM buttons WHERE id=?", (int(button_id),))
@@ -294,23 +1191,22 @@ async def swap_with_neighbor(button_id: int, up: bool = True) -> None:
 
     nbid, npos = int(neighbor[0]), int(neighbor[1])
 
-    async with _connect() as db:
-        await _prepare(db)
+    async with _tx() as db:
         await db.execute("UPDATE buttons SET pos=? WHERE id=?", (npos, button_id))
         await db.execute("UPDATE buttons SET pos=? WHERE id=?", (pos, nbid))
-        await db.commit()
+    await _caches_changed()
 
 # ============== Button Contents ==============
 async def add_button_content(button_id: int, media_type: str,
                              file_id: Optional[str], caption: Optional[str]) -> int:
-    async with _connect() as db:
-        await _prepare(db)
+    async with _tx() as db:
         cur = await db.execute(
             "INSERT INTO button_contents(button_id, media_type, file_id, caption) VALUES(?, ?, ?, ?)",
             (int(button_id), media_type, file_id, caption)
         )
-        await db.commit()
-        return cur.lastrowid
+        cid = cur.lastrowid
+    await _caches_changed()
+    return cid
 
 async def list_button_contents(button_id: int) -> List[Tuple[int, str, Optional[str], Optional[str]]]:
     rows = await _fetchall("""
@@ -323,8 +1219,19 @@ async def list_button_contents(button_id: int) -> List[Tuple[int, str, Optional[
 
 async def delete_button_content(content_id: int) -> None:
     await _exec("DELETE FROM button_contents WHERE id=?", (int(content_id),))
+    await _caches_changed()
 
 # ============== Adminlar ==============
+# user_id -> is_super. init_db() yuklaydi, add_admin/remove_admin yangilaydi;
+# is_admin/is_super_admin SQLite'ga bormaydi.
+_admins: Optional[Dict[int, bool]] = None
+
+async def load_admins() -> Dict[int, bool]:
+    global _admins
+    rows = await _fetchall("SELECT user_id, is_super FROM admins")
+    _admins = {int(r[0]): bool(r[1]) for r in rows}
+    return _admins
+
 async def add_admin(user_id: int, name: Optional[str] = None, is_super: bool = False) -> None:
     await _exec("""
     INSERT INTO admins(user_id, name, is_super)
@@ -333,21 +1240,27 @@ async def add_admin(user_id: int, name: Optional[str] = None, is_super: bool = F
         name=excluded.name,
         is_super=excluded.is_super
     """, (int(user_id), name, 1 if is_super else 0))
+    if _admins is not None:
+        _admins[int(user_id)] = bool(is_super)
+    await _caches_changed()
 
 async def remove_admin(user_id: int) -> None:
     await _exec("DELETE FROM admins WHERE user_id=?", (int(user_id),))
+    if _admins is not None:
+        _admins.pop(int(user_id), None)
+    await _caches_changed()
 
 async def list_admins() -> List[Tuple[int, Optional[str]]]:
     rows = await _fetchall("SELECT user_id, name FROM admins ORDER BY is_super DESC, user_id ASC")
     return [(int(r[0]), r[1]) for r in rows]
 
 async def is_admin(user_id: int) -> bool:
-    v = await _fetchval("SELECT 1 FROM admins WHERE user_id=? LIMIT 1", (int(user_id),))
-    return v is not None
+    admins = _admins if _admins is not None else await load_admins()
+    return int(user_id) in admins
 
 async def is_super_admin(user_id: int) -> bool:
-    v = await _fetchval("SELECT 1 FROM admins WHERE user_id=? AND is_super=1 LIMIT 1", (int(user_id),))
-    return v is not None
+    admins = _admins if _admins is not None else await load_admins()
+    return admins.get(int(user_id), False)
 
 async def bootstrap_super_admin(user_id: int | str | None = None, name: str | None = None) -> None:
     if user_id is None:
@@ -362,7 +1275,6 @@ async def bootstrap_super_admin(user_id: int | str | None = None, name: str | No
         uid = int(user_id)
     except Exception:
         return
-    row = await _fetchone("SELECT is_super FROM admins WHERE user_id=?", (uid,))
-    if row and int(row[0]) == 1:
+    if await is_super_admin(uid):
         return
     await add_admin(uid, name, is_super=True)
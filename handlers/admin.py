@@ -1,42 +1,64 @@
 # handlers/admin.py  (aiogram v3)
 from __future__ import annotations
-import asyncio
-from aiogram import Router, F, Bot
+from aiogram import BaseMiddleware, Router, F, Bot
 from aiogram.filters import Command
-from aiogram.types import CallbackQuery, Message, InlineKeyboardMarkup, InlineKeyboardButton, BufferedInputFile
+from aiogram.types import CallbackQuery, Message, InlineKeyboardMarkup, InlineKeyboardButton, FSInputFile, TelegramObject
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.fsm.context import FSMContext
-from datetime import datetime, timedelta, timezone
-from openpyxl import Workbook
-import io
-from typing import Optional, List, Tuple
+import html
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional, List, Tuple
 
 from keyboards import (
     admin_menu_kb, channels_kb, buttons_menu_kb, users_menu_kb, back_only_kb,
-    ch_add_mode_kb, pick_button_kb, cols_kb
+    ch_add_mode_kb, pick_button_kb, cols_kb, page_slice, page_nav_row, export_format_kb
 )
 from utils.telegram import safe_edit
+from utils.broadcast import start_broadcast
+from utils.subscription import clear_subscription_cache
+from utils.export import export_users, FORMATS as EXPORT_FORMATS
 from db import (
     # channels
     save_channel, remove_channel, list_channels_full,
+    set_channel_auto_approve, set_channel_join, approve_queue_stats,
     # users
-    count_users_range, fetch_all_users, fetch_all_user_ids,
+    user_stats, user_daily_series,
     # buttons (nested)
-    create_button, list_buttons, find_button_by_title, has_children,
+    create_button, list_button_tree,
     rename_button, delete_button, add_button_content, list_button_contents,
     delete_button_content, swap_with_neighbor, get_menu_cols, set_menu_cols,
     # admins
-    is_admin, is_super_admin, add_admin, remove_admin, list_admins, bootstrap_super_admin,
+    is_admin, is_super_admin, add_admin, remove_admin, list_admins,
+    # profil
+    DB_PROFILE, profile_report, profile_reset,
 )
 
 admin_router = Router()
 
+
+class AdminOnlyMiddleware(BaseMiddleware):
+    """
+    admin_router'dagi har bir handlerdan oldin bir marta: foydalanuvchi
+    adminlar to‘plamida (xotirada) bo‘lmasa, handler chaqirilmaydi.
+    """
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: Dict[str, Any]) -> Any:
+        user = data.get("event_from_user")
+        if user is None or not await is_admin(user.id):
+            if isinstance(event, CallbackQuery):
+                await event.answer("Ruxsat yo‘q.")
+            return None
+        return await handler(event, data)
+
+
+admin_router.message.middleware(AdminOnlyMiddleware())
+admin_router.callback_query.middleware(AdminOnlyMiddleware())
+
 # ---------- /admin kirish faqat bu faylda emas START.py dagi handlerlar orqali ----------
 
 @admin_router.callback_query(F.data == "admin_back")
 async def back_to_root(cb: CallbackQuery):
-    if not (await is_admin(cb.from_user.id)):
-        return await cb.answer("Ruxsat yo‘q.")
     await safe_edit(cb.message, "Admin panel:", reply_markup=admin_menu_kb())
     await cb.answer()
 
@@ -54,8 +76,6 @@ class ChAddSG(StatesGroup):
 
 @admin_router.callback_query(F.data == "ad_channels")
 async def ch_root(cb: CallbackQuery):
-    if not (await is_admin(cb.from_user.id)):
-        return await cb.answer("Ruxsat yo‘q.")
     await safe_edit(cb.message, "📌 Majburiy kanallar:", reply_markup=channels_kb())
     await cb.answer()
 
@@ -120,7 +140,7 @@ async def ch_add_choose_type(cb: CallbackQuery, state: FSMContext, bot: Bot):
             return await cb.answer()
 
     url = _normalize_url(username, invite_link)
-    await save_channel(str(chat_id), title, username, invite_link, url)
+    await save_channel(str(chat_id), title, username, invite_link, url, is_join=is_join)
     await state.clear()
     await safe_edit(cb.message, f"✅ Kanal qo‘shildi:\n<b>{title or '—'}</b>\nID: <code>{chat_id}</code>\nURL: {url or '—'}\n/admin",
                     reply_markup=channels_kb())
@@ -135,24 +155,53 @@ async def ch_add_collect_link_and_save(m: Message, state: FSMContext):
     chat_id = d["chat_id"]; title = d.get("title"); username = d.get("username")
     await state.clear()
     url = _normalize_url(username, link)
-    await save_channel(str(chat_id), title, username, link, url)
+    await save_channel(str(chat_id), title, username, link, url, is_join=True)
     await m.answer(f"✅ Kanal qo‘shildi:\n<b>{title or '—'}</b>\nID: <code>{chat_id}</code>\nURL: {url}\n/admin")
 
-@admin_router.callback_query(F.data == "ch_list")
-async def ch_list(cb: CallbackQuery):
+async def _channel_list_view() -> Optional[InlineKeyboardMarkup]:
     rows = await list_channels_full()
     if not rows:
-        await safe_edit(cb.message, "Ro‘yxat bo‘sh.", reply_markup=channels_kb())
-        return await cb.answer()
+        return None
     ikb = []
-    for (chat_id, title, username, invite_link, url) in rows:
+    for (chat_id, title, username, invite_link, url, is_join, _auto) in rows:
         open_url = _normalize_url(username, invite_link, url) or "https://t.me/"
-        text = f"{title or '—'}  ({chat_id})"
-        ikb.append([InlineKeyboardButton(text=text, url=open_url)])
+        text = f"{'🔒 ' if is_join else ''}{title or '—'}  ({chat_id})"
+        toggle = "🔒 Zayavka" if is_join else "🔓 Oddiy"
+        ikb.append([
+            InlineKeyboardButton(text=text, url=open_url),
+            InlineKeyboardButton(text=toggle, callback_data=f"chjoin:{chat_id}:{0 if is_join else 1}"),
+        ])
     ikb.append([InlineKeyboardButton(text="⬅️ Orqaga", callback_data="ad_channels")])
-    await safe_edit(cb.message, "📋 Majburiy kanallar ro‘yxati:", reply_markup=InlineKeyboardMarkup(inline_keyboard=ikb))
+    return InlineKeyboardMarkup(inline_keyboard=ikb)
+
+CH_LIST_TEXT = (
+    "📋 Majburiy kanallar ro‘yxati:\n"
+    "🔒 Zayavka — join-request kanal: yuborilgan so‘rov obuna hisoblanadi.\n"
+    "Turini almashtirish uchun o‘ngdagi tugmani bosing."
+)
+
+@admin_router.callback_query(F.data == "ch_list")
+async def ch_list(cb: CallbackQuery):
+    kb = await _channel_list_view()
+    if kb is None:
+        await safe_edit(cb.message, "Ro‘yxat bo‘sh.", reply_markup=channels_kb())
+        return await cb.answer()
+    await safe_edit(cb.message, CH_LIST_TEXT, reply_markup=kb)
     await cb.answer()
 
+@admin_router.callback_query(F.data.startswith("chjoin:"))
+async def ch_join_toggle(cb: CallbackQuery):
+    # migratsiyadan oldin qo‘shilgan join-request kanallar is_join=0 bo‘lib qolgan — shu yerda belgilanadi
+    try:
+        chat_id, on = cb.data.split(":", 1)[1].rsplit(":", 1)
+    except ValueError:
+        return await cb.answer()
+    await set_channel_join(chat_id, on == "1")
+    clear_subscription_cache()
+    kb = await _channel_list_view()
+    await safe_edit(cb.message, CH_LIST_TEXT if kb else "Ro‘yxat bo‘sh.", reply_markup=kb or channels_kb())
+    await cb.answer("Zayavka kanal." if on == "1" else "Oddiy kanal.")
+
 @admin_router.callback_query(F.data == "ch_del")
 async def ch_del_pick(cb: CallbackQuery):
     rows = await list_channels_full()
@@ -192,15 +241,46 @@ async def ch_del_do(cb: CallbackQuery):
         await safe_edit(cb.message, "Bekor qilindi.", reply_markup=channels_kb())
         await cb.answer()
 
+# ---------- Avto-tasdiqlash (join-request kanallar) ----------
+async def _auto_approve_view() -> Tuple[str, InlineKeyboardMarkup]:
+    st = await approve_queue_stats()
+    txt = ("🤖 Join-request avto-tasdiqlash\n"
+           f"⏳ Navbatda: {st['pending']}\n"
+           f"✅ Tasdiqlandi: {st['ok_1m']}/daq, {st['ok_1h']}/soat\n"
+           f"⚠️ Xato (1 soat): {st['fail_1h']}")
+    ikb = []
+    for (chat_id, title, _u, _l, _url, is_join, auto) in await list_channels_full():
+        if not is_join:
+            continue
+        mark = "🟢" if auto else "⚪️"
+        ikb.append([InlineKeyboardButton(text=f"{mark} {title or chat_id}", callback_data=f"chauto:{chat_id}:{0 if auto else 1}")])
+    if not ikb:
+        txt += "\n\nJoin-request kanal yo‘q."
+    ikb.append([InlineKeyboardButton(text="🔄 Yangilash", callback_data="ch_auto")])
+    ikb.append([InlineKeyboardButton(text="⬅️ Orqaga", callback_data="ad_channels")])
+    return txt, InlineKeyboardMarkup(inline_keyboard=ikb)
+
+@admin_router.callback_query(F.data == "ch_auto")
+async def ch_auto(cb: CallbackQuery):
+    txt, kb = await _auto_approve_view()
+    await safe_edit(cb.message, txt, reply_markup=kb)
+    await cb.answer()
+
+@admin_router.callback_query(F.data.startswith("chauto:"))
+async def ch_auto_toggle(cb: CallbackQuery):
+    try:
+        _, chat_id, on = cb.data.split(":")
+    except ValueError:
+        return await cb.answer()
+    await set_channel_auto_approve(chat_id, on == "1")
+    txt, kb = await _auto_approve_view()
+    await safe_edit(cb.message, txt, reply_markup=kb)
+    await cb.answer("Yoqildi." if on == "1" else "O‘chirildi.")
+
 # ==================== TUGMALAR (nested, async) ====================
-async def _flatten_buttons_for_pick(parent_id: int | None = None, prefix: str = "") -> List[Tuple[int, str]]:
-    items: List[Tuple[int, str]] = []
-    rows = await list_buttons(parent_id)
-    for bid, title in rows:
-        items.append((bid, f"{prefix}{title}"))
-        if await has_children(bid):
-            items += await _flatten_buttons_for_pick(bid, prefix + "› ")
-    return items
+async def _flatten_buttons_for_pick() -> List[Tuple[int, str]]:
+    # butun daraxt bitta rekursiv so‘rov bilan
+    return [(bid, f"{'› ' * depth}{title}") for bid, title, depth in await list_button_tree()]
 
 class BtnCreateSG(StatesGroup):
     parent = State()
@@ -217,17 +297,50 @@ class BtnAddContentSG(StatesGroup):
     btn_id = State()
     waiting_media = State()
 
-def _add_where_kb(flat_items):
+def _add_where_kb(flat_items, page: int = 0):
+    chunk, page, pages = page_slice(flat_items, page)
     rows = [[InlineKeyboardButton(text="📁 Root’ga qo‘shish", callback_data="add_here:root")]]
-    for bid, label in flat_items:
+    for bid, label in chunk:
         rows.append([InlineKeyboardButton(text=f"📂 {label}", callback_data=f"add_here:{bid}")])
+    nav = page_nav_row("add_here", page, pages)
+    if nav:
+        rows.append(nav)
     rows.append([InlineKeyboardButton(text="⬅️ Orqaga", callback_data="ad_buttons")])
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
+# Sahifalangan tanlovlar: prefix -> sarlavha
+_PICK_TITLES = {
+    "add_here":     "Yangi tugma qayerga qo‘shilsin?",
+    "pick_rnm":     "Qaysi tugma?",
+    "pick_move":    "Qaysi tugma ko‘chirilsin?",
+    "pick_del":     "Qaysi tugma o‘chirilsin?",
+    "pick_content": "Qaysi tugmaga kontent qo‘shamiz?",
+    "pick_showc":   "Qaysi tugmaniki?",
+}
+
+@admin_router.callback_query(F.data.startswith("pg:"))
+async def pick_page(cb: CallbackQuery):
+    try:
+        _, prefix, page = cb.data.split(":")
+        page = int(page)
+    except ValueError:
+        return await cb.answer()
+    if prefix not in _PICK_TITLES:
+        return await cb.answer()
+    flat = await _flatten_buttons_for_pick()
+    if prefix == "add_here":
+        kb = _add_where_kb(flat, page)
+    else:
+        kb = pick_button_kb(flat, "ad_buttons", prefix, page)
+    await safe_edit(cb.message, _PICK_TITLES[prefix], reply_markup=kb)
+    await cb.answer()
+
+@admin_router.callback_query(F.data == "noop")
+async def noop_cb(cb: CallbackQuery):
+    await cb.answer()
+
 @admin_router.callback_query(F.data == "ad_buttons")
 async def btn_menu(cb: CallbackQuery):
-    if not (await is_admin(cb.from_user.id)):
-        return await cb.answer("Ruxsat yo‘q.")
     cols = await get_menu_cols()
     await safe_edit(cb.message, "Tugmalar menyusi:", reply_markup=buttons_menu_kb(cols))
     await cb.answer()
@@ -248,7 +361,7 @@ async def btn_cols_set(cb: CallbackQuery):
 # Yangi tugma (joy tanlash -> nom yuborish)
 @admin_router.callback_query(F.data == "btn_add")
 async def btn_add_where(cb: CallbackQuery, state: FSMContext):
-    flat = await _flatten_buttons_for_pick(None)
+    flat = await _flatten_buttons_for_pick()
     await state.set_state(BtnCreateSG.parent)
     await safe_edit(cb.message, "Yangi tugma qayerga qo‘shilsin?", reply_markup=_add_where_kb(flat))
     await cb.answer()
@@ -270,13 +383,15 @@ async def btn_add_save(m: Message, state: FSMContext):
     if not title:
         return await m.answer("Nom bo‘sh bo‘lmasin.")
     bid = await create_button(title, parent_id)
+    if bid is None:
+        return await m.answer("❌ Bu joyda shu nomli tugma bor. Boshqa nom yuboring:")
     await state.clear()
     await m.answer(f"✅ Tugma yaratildi (ID={bid}). /admin")
 
 # Nomini o‘zgartirish
 @admin_router.callback_query(F.data == "btn_rename")
 async def btn_rename_pick(cb: CallbackQuery, state: FSMContext):
-    flat = await _flatten_buttons_for_pick(None)
+    flat = await _flatten_buttons_for_pick()
     if not flat:
         return await safe_edit(cb.message, "Tugmalar yo‘q.", reply_markup=buttons_menu_kb(await get_menu_cols()))
     await state.set_state(BtnRenameSG.btn_id)
@@ -294,7 +409,11 @@ async def btn_rename_wait_name(cb: CallbackQuery, state: FSMContext):
 @admin_router.message(BtnRenameSG.new_title)
 async def btn_rename_do(m: Message, state: FSMContext):
     d = await state.get_data()
-    await rename_button(d["btn_id"], (m.text or "").strip())
+    title = (m.text or "").strip()
+    if not title:
+        return await m.answer("Nom bo‘sh bo‘lmasin.")
+    if not await rename_button(d["btn_id"], title):
+        return await m.answer("❌ Bu joyda shu nomli tugma bor. Boshqa nom yuboring:")
     await state.clear()
     await m.answer("✅ Nom o‘zgartirildi. /admin")
 
@@ -308,7 +427,7 @@ def move_controls_kb(bid: int) -> InlineKeyboardMarkup:
 
 @admin_router.callback_query(F.data == "btn_move")
 async def btn_move_pick(cb: CallbackQuery, state: FSMContext):
-    flat = await _flatten_buttons_for_pick(None)
+    flat = await _flatten_buttons_for_pick()
     if not flat:
         return await safe_edit(cb.message, "Tugmalar yo‘q.", reply_markup=buttons_menu_kb(await get_menu_cols()))
     await state.set_state(BtnMoveSG.btn_id)
@@ -338,7 +457,7 @@ def del_confirm_kb(bid: int) -> InlineKeyboardMarkup:
 
 @admin_router.callback_query(F.data == "btn_del")
 async def btn_del_pick(cb: CallbackQuery):
-    flat = await _flatten_buttons_for_pick(None)
+    flat = await _flatten_buttons_for_pick()
     if not flat:
         return await safe_edit(cb.message, "Tugmalar yo‘q.", reply_markup=buttons_menu_kb(await get_menu_cols()))
     await safe_edit(cb.message, "Qaysi tugma o‘chirilsin?", reply_markup=pick_button_kb(flat, "ad_buttons", "pick_del"))
@@ -369,7 +488,7 @@ def content_manage_kb(items):
 
 @admin_router.callback_query(F.data == "btn_add_content")
 async def btn_add_content_ask(cb: CallbackQuery, state: FSMContext):
-    flat = await _flatten_buttons_for_pick(None)
+    flat = await _flatten_buttons_for_pick()
     if not flat:
         return await safe_edit(cb.message, "Tugmalar yo‘q.", reply_markup=buttons_menu_kb(await get_menu_cols()))
     await state.set_state(BtnAddContentSG.btn_id)
@@ -410,7 +529,7 @@ async def btn_add_content_save(m: Message, state: FSMContext):
 
 @admin_router.callback_query(F.data == "btn_list_content")
 async def btn_list_content_pick(cb: CallbackQuery):
-    flat = await _flatten_buttons_for_pick(None)
+    flat = await _flatten_buttons_for_pick()
     if not flat:
         return await safe_edit(cb.message, "Tugmalar yo‘q.", reply_markup=buttons_menu_kb(await get_menu_cols()))
     await safe_edit(cb.message, "Qaysi tugmaniki?", reply_markup=pick_button_kb(flat, "ad_buttons", "pick_showc"))
@@ -445,27 +564,35 @@ async def users_menu(cb: CallbackQuery):
 
 @admin_router.callback_query(F.data == "u_stats")
 async def users_stats(cb: CallbackQuery):
-    now = datetime.now(timezone.utc)
-    total = await count_users_range(None)
-    last24 = await count_users_range((now - timedelta(days=1)).isoformat())
-    last7  = await count_users_range((now - timedelta(days=7)).isoformat())
-    last30 = await count_users_range((now - timedelta(days=30)).isoformat())
-    txt = (f"👥 Umumiy: <b>{total}</b>\n"
-           f"🕐 24 soat: <b>{last24}</b>\n"
-           f"📅 Oxirgi hafta: <b>{last7}</b>\n"
-           f"🗓️ Oxirgi 30 kun: <b>{last30}</b>")
+    st = await user_stats()
+    series = await user_daily_series(7)
+    days = "\n".join(f"   {day[5:]}: {n}" for day, n in series)
+    txt = (f"👥 Umumiy: <b>{st['total']}</b>\n"
+           f"🟢 Faol: <b>{st['live']}</b>\n"
+           f"🚫 Bloklagan: <b>{st['dead']}</b>\n"
+           f"🕐 24 soat: <b>{st['d1']}</b>\n"
+           f"📅 Oxirgi hafta: <b>{st['d7']}</b>\n"
+           f"🗓️ Oxirgi 30 kun: <b>{st['d30']}</b>\n\n"
+           f"📈 Kunlar bo‘yicha:\n{days}")
     await safe_edit(cb.message, txt, reply_markup=users_menu_kb())
     await cb.answer()
 
 @admin_router.callback_query(F.data == "u_export")
+async def users_export_choose(cb: CallbackQuery):
+    await safe_edit(cb.message, "Qaysi formatda yuklaymiz?", reply_markup=export_format_kb())
+    await cb.answer()
+
+@admin_router.callback_query(F.data.startswith("u_export:"))
 async def users_export(cb: CallbackQuery, bot: Bot):
-    rows = await fetch_all_users()
-    wb = Workbook(); ws = wb.active; ws.title = "users"
-    ws.append(["user_id","first_name","last_name","username","joined_at"])
-    for r in rows: ws.append(list(r))
-    buf = io.BytesIO(); wb.save(buf); buf.seek(0)
-    await bot.send_document(cb.from_user.id, document=BufferedInputFile(buf.getvalue(), filename="users.xlsx"))
-    await cb.answer("Yuklandi.")
+    fmt = cb.data.split(":", 1)[1]
+    if fmt not in EXPORT_FORMATS:
+        return await cb.answer()
+    await cb.answer("Tayyorlanmoqda...")
+    path = await export_users(fmt)
+    try:
+        await bot.send_document(cb.from_user.id, document=FSInputFile(path, filename=f"users{EXPORT_FORMATS[fmt]}"))
+    finally:
+        os.remove(path)
 
 # ==================== ADMINLAR (oddiy) ====================
 class AdmAddSG(StatesGroup):
@@ -483,8 +610,6 @@ def _admins_menu_kb(super_mode: bool) -> InlineKeyboardMarkup:
 
 @admin_router.callback_query(F.data == "ad_admins")
 async def admins_root(cb: CallbackQuery):
-    if not (await is_admin(cb.from_user.id)):
-        return await cb.answer("Yo‘q.")
     super_mode = await is_super_admin(cb.from_user.id)
     await safe_edit(cb.message, "Adminlar:", reply_markup=_admins_menu_kb(super_mode))
     await cb.answer()
@@ -545,14 +670,42 @@ async def admins_del_do(m: Message, state: FSMContext):
     await state.clear()
     await m.answer("✅ O‘chirildi. /admin")
 
+# ==================== DB PROFIL ====================
+# /dbprof [n] — umumiy vaqt bo‘yicha eng og‘ir so‘rovlar; /dbprof reset — tozalash.
+@admin_router.message(Command("dbprof"))
+async def db_profile(m: Message):
+    if not DB_PROFILE:
+        return await m.answer("Profil o‘chirilgan. Yoqish: DB_PROFILE=1 (sekin chegarasi: DB_SLOW_MS).")
+    arg = (m.text or "").split(maxsplit=1)[1:] or [""]
+    if arg[0] == "reset":
+        profile_reset()
+        return await m.answer("✅ Profil tozalandi.")
+    n = int(arg[0]) if arg[0].isdigit() else 10
+    stats = profile_report(max(1, min(n, 30)))
+    if not stats:
+        return await m.answer("Hali so‘rov yo‘q.")
+    lines = ["🐢 Eng og‘ir so‘rovlar (umumiy vaqt):"]
+    for i, st in enumerate(stats, 1):
+        avg = st.total / st.calls if st.calls else 0.0
+        lines.append(
+            f"{i}. <b>{st.total * 1000:.0f} ms</b> / {st.calls} = {avg * 1000:.2f} ms "
+            f"(max {st.worst * 1000:.1f}) — {html.escape(st.caller)}"
+            + (" ⚠️ SCAN" if st.scan else "")
+            + f"\n<code>{html.escape(st.sql[:200])}</code>"
+        )
+    text = ""
+    for line in lines:
+        if len(text) + len(line) + 1 > 4000:
+            break
+        text += line + "\n"
+    await m.answer(text)
+
 # ==================== REKLAMA / BROADCAST ====================
 class BroadcastSG(StatesGroup):
     waiting = State()
 
 @admin_router.callback_query(F.data == "ad_broadcast")
 async def broadcast_start(cb: CallbackQuery, state: FSMContext):
-    if not (await is_admin(cb.from_user.id)):
-        return await cb.answer("Ruxsat yo‘q.")
     await state.set_state(BroadcastSG.waiting)
     await safe_edit(cb.message,
         "Reklama xabarini yuboring (matn / rasm / video / hujjat / audio / gif / *forward ham bo‘ladi*).\n"
@@ -561,16 +714,6 @@ async def broadcast_start(cb: CallbackQuery, state: FSMContext):
 
 @admin_router.message(BroadcastSG.waiting)
 async def broadcast_do(m: Message, state: FSMContext, bot: Bot):
-    if not (await is_admin(m.from_user.id)):
-        return await m.answer("Ruxsat yo‘q.")
-    users = await fetch_all_user_ids()
-    ok = 0; fail = 0
-    for uid in users:
-        try:
-            await bot.copy_message(chat_id=uid, from_chat_id=m.chat.id, message_id=m.message_id)
-            ok += 1
-        except Exception:
-            fail += 1
-        await asyncio.sleep(0.05)  # throttling
     await state.clear()
-    await m.answer(f"✅ Yuborildi: {ok} ta\n⚠️ Yuborilmadi: {fail} ta\n/admin")
+    # yuborish fonda ketadi; progress xabari vaqti-vaqti bilan yangilanadi
+    await start_broadcast(bot, from_chat_id=m.chat.id, message_id=m.message_id, admin_chat_id=m.chat.id)
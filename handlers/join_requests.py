@@ -1,12 +1,18 @@
 from aiogram import Router
 from aiogram.types import ChatJoinRequest
-from utils.shared import user_join_requests
+
+from db import add_join_request
+from utils.subscription import invalidate_subscription
+from utils.approver import notify as notify_approver
 
 join_router = Router()
 
 @join_router.chat_join_request()
 async def handle_join_request(ev: ChatJoinRequest):
     uid = ev.from_user.id
-    cid = str(ev.chat.id)
-    user_join_requests.setdefault(uid, set()).add(cid)
-    # xohlasang auto-approve: await ev.approve()
+    queued = await add_join_request(uid, str(ev.chat.id), int(ev.date.timestamp()))
+    # keshdagi salbiy natija so‘rov yuborilgach darhol eskiradi
+    invalidate_subscription(uid)
+    if queued:
+        # auto_approve kanal: utils/approver.py navbatdan tasdiqlaydi
+        notify_approver()
@@ -1,19 +1,21 @@
 # handlers/start.py
 from __future__ import annotations
-from aiogram import Router, F, Bot
-from aiogram.filters import CommandStart, Command
-from aiogram.types import Message, CallbackQuery, ReplyKeyboardRemove
+import os
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Router, F, Bot
+from aiogram.filters import CommandStart, Command, ChatMemberUpdatedFilter, KICKED, MEMBER
+from aiogram.types import Message, CallbackQuery, ReplyKeyboardRemove, ChatMemberUpdated, TelegramObject
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 
 from db import (
-    upsert_user, get_menu_cols,
-    list_buttons, find_button_by_title, has_children,
-    list_button_contents, get_button_parent,
-    is_admin, bootstrap_super_admin
+    queue_user_upsert, get_menu_cols, get_button_tree,
+    is_admin, set_user_dead
 )
-from utils.subscription import check_subscriptions, get_unsubscribed
-from keyboards import subscribe_kb, reply_menu_kb, admin_menu_kb
+from utils.subscription import evaluate_subscriptions, invalidate_subscription
+from utils.delivery import get_plan, execute_plan
+from keyboards import subscribe_kb, cached_reply_menu_kb, admin_menu_kb
 
 start_router = Router()
 
@@ -22,60 +24,95 @@ WELCOME = (
     "Quyidagi majburiy kanallarga obuna bo‘ling. So‘ng «✅ Tekshirish» bosing."
 )
 
-MAX_TEXT = 4096
-MAX_CAPTION = 1024
-
-
-def _chunks(s: str, n: int):
-    for i in range(0, len(s), n):
-        yield s[i:i+n]
-
-
 class NavSG(StatesGroup):
     here = State()  # current parent_id (None = root)
 
 
 async def _show_level(chat: Message, parent_id: int | None):
     cols = await get_menu_cols()
-    btns = await list_buttons(parent_id)
-    kb = reply_menu_kb(btns, cols, with_back=(parent_id is not None))
+    tree = get_button_tree()
+    kb = cached_reply_menu_kb(parent_id, tree.list(parent_id), cols, tree.version)
     await chat.answer(
         "📂 Menyu",
         reply_markup=kb
     )
 
 
-async def _guard_sub_msg(m: Message, bot: Bot) -> bool:
-    """Har safar /start yoki tugma bosilganda obunani tekshiradi."""
-    ok = await check_subscriptions(m.from_user.id, bot)
-    if ok:
-        return True
-    need = await get_unsubscribed(m.from_user.id, bot)
-    await m.answer(WELCOME, reply_markup=ReplyKeyboardRemove())
-    await m.answer("👇 Majburiy kanallar:", reply_markup=subscribe_kb(need))
-    return False
+# ---------------------- Obuna gate (outer middleware) ----------------------
+# Bu buyruqlar obunasiz ham ishlaydi (vergul bilan, "/" siz)
+SUB_GATE_ALLOW = frozenset(
+    c.strip().lstrip("/").lower()
+    for c in os.getenv("SUB_GATE_ALLOW", "help,admin,dbprof").split(",") if c.strip()
+)
 
 
-async def _guard_sub_cb(cb: CallbackQuery, bot: Bot) -> bool:
-    """Callback (✅ Tekshirish) uchun guard."""
-    ok = await check_subscriptions(cb.from_user.id, bot)
-    if ok:
-        return True
-    need = await get_unsubscribed(cb.from_user.id, bot)
-    try:
-        await cb.message.edit_text(WELCOME, reply_markup=subscribe_kb(need))
-    except Exception:
-        await cb.message.answer(WELCOME, reply_markup=subscribe_kb(need))
-    await cb.answer("Hali hammasi emas.")
-    return False
+def _command(text: str | None) -> str | None:
+    if not text or not text.startswith("/"):
+        return None
+    return text[1:].split(maxsplit=1)[0].split("@", 1)[0].lower()
+
+
+class SubscriptionGate(BaseMiddleware):
+    """
+    start_router'ga kelgan har bir update uchun obunani bir marta baholaydi
+    (keshlangan natijalar bilan) va natijani handlerga `sub` sifatida beradi.
+    Obuna to‘liq bo‘lmasa, handler chaqirilmaydi — obuna klaviaturasi yuboriladi.
+
+    Tekshiriladi: NavSG.here holatidagi matnli xabarlar, holatsiz buyruqlar
+    (SUB_GATE_ALLOW'dan tashqari) va «✅ Tekshirish» callback'i. Admin
+    oqimlari (boshqa FSM holatlari) gate'dan o‘tmaydi.
+    """
+
+    def _applies(self, event: TelegramObject, data: Dict[str, Any]) -> bool:
+        if isinstance(event, CallbackQuery):
+            return event.data == "check_sub"
+        if not isinstance(event, Message) or event.chat.type != "private":
+            return False
+        raw_state = data.get("raw_state")
+        cmd = _command(event.text)
+        if cmd is not None:
+            return cmd not in SUB_GATE_ALLOW and raw_state in (None, NavSG.here.state)
+        # faqat matn — menyu handler'lari shuni ushlaydi; stiker/rasm/ovozga javob yo‘q
+        return raw_state == NavSG.here.state and event.text is not None
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: Dict[str, Any]) -> Any:
+        user = data.get("event_from_user")
+        if user is None or not self._applies(event, data):
+            return await handler(event, data)
+
+        if isinstance(event, CallbackQuery):
+            # foydalanuvchi hozirgina obuna bo‘lgan bo‘lishi mumkin — keshni chetlab o‘tamiz
+            invalidate_subscription(user.id)
+        upd = data.get("event_update")
+        res = await evaluate_subscriptions(user.id, data["bot"], upd.update_id if upd else None)
+        data["sub"] = res
+        if res.ok:
+            return await handler(event, data)
+
+        need = list(res.missing)
+        if isinstance(event, CallbackQuery):
+            try:
+                await event.message.edit_text(WELCOME, reply_markup=subscribe_kb(need))
+            except Exception:
+                await event.message.answer(WELCOME, reply_markup=subscribe_kb(need))
+            await event.answer("Hali hammasi emas.")
+        else:
+            if _command(event.text) == "start":
+                queue_user_upsert(event.from_user)
+            await event.answer(WELCOME, reply_markup=ReplyKeyboardRemove())
+            await event.answer("👇 Majburiy kanallar:", reply_markup=subscribe_kb(need))
+        return None
+
+
+start_router.message.outer_middleware(SubscriptionGate())
+start_router.callback_query.outer_middleware(SubscriptionGate())
 
 
 # ---------------------- START ----------------------
 @start_router.message(CommandStart())
-async def cmd_start(m: Message, bot: Bot, state: FSMContext):
-    await upsert_user(m.from_user)
-    if not await _guard_sub_msg(m, bot):
-        return
+async def cmd_start(m: Message, state: FSMContext):
+    queue_user_upsert(m.from_user)  # diskni kutmaymiz — fon vazifasi yozadi
     # /start odatdagidek menyuni ko‘rsatadi (REKLAMA YO‘Q)
     await state.set_state(NavSG.here)
     await state.update_data(parent_id=None)
@@ -110,7 +147,6 @@ async def help_any(m: Message):
 # ---------------------- /admin har doim ishlasin ----------------------
 @start_router.message(NavSG.here, Command("admin"))
 async def admin_from_state(m: Message, state: FSMContext):
-    await bootstrap_super_admin(m.from_user.id, m.from_user.full_name)
     if not await is_admin(m.from_user.id):
         return await m.answer("Bu bo‘lim faqat adminlar uchun.")
     await state.clear()  # menyu holatidan chiqamiz
@@ -118,7 +154,6 @@ async def admin_from_state(m: Message, state: FSMContext):
 
 @start_router.message(Command("admin"))
 async def admin_any(m: Message, state: FSMContext):
-    await bootstrap_super_admin(m.from_user.id, m.from_user.full_name)
     if not await is_admin(m.from_user.id):
         return await m.answer("Bu bo‘lim faqat adminlar uchun.")
     await state.clear()
@@ -127,101 +162,41 @@ async def admin_any(m: Message, state: FSMContext):
 
 # ---------------------- Navigatsiya ----------------------
 @start_router.message(NavSG.here, F.text == "⬅️ Orqaga")
-async def go_back(m: Message, state: FSMContext, bot: Bot):
-    if not await _guard_sub_msg(m, bot):
-        return
+async def go_back(m: Message, state: FSMContext):
     d = await state.get_data()
     current = d.get("parent_id")
-    up_id = await get_button_parent(current) if current is not None else None
+    up_id = get_button_tree().parent_of(current)
     await state.update_data(parent_id=up_id)
     await _show_level(m, up_id)
 
 # MUHIM: buyruqlarni ("/...") ushlamasin
 @start_router.message(NavSG.here, F.text & ~F.text.startswith("/"))
 async def handle_press(m: Message, state: FSMContext, bot: Bot):
-    if not await _guard_sub_msg(m, bot):
-        return
-
     d = await state.get_data()
     parent_id = d.get("parent_id")
     title = (m.text or "").strip()
 
-    found = await find_button_by_title(parent_id, title)
+    tree = get_button_tree()
+    found = tree.find(parent_id, title)
     if not found:
         return await _show_level(m, parent_id)
 
     bid, _ = found
-    if await has_children(bid):
+    if tree.has_children(bid):
         await state.update_data(parent_id=bid)
         return await _show_level(m, bid)
 
-    if not await _guard_sub_msg(m, bot):
-        return
-
-    items = await list_button_contents(bid)
-    if not items:
+    plan = await get_plan(bid)
+    if not plan:
         return await m.answer("Bu tugmada hozircha kontent yo‘q.")
 
-    text_kwargs = dict(parse_mode=None, disable_web_page_preview=True)
-    media_kwargs = dict(parse_mode=None)
-
-    for _id, mtype, file_id, caption in items:
-        text = (caption or "").strip()
-
-        if mtype == "text":
-            for part in _chunks(text or " ", MAX_TEXT):
-                await m.answer(part, **text_kwargs)
-
-        elif mtype == "photo":
-            if text and len(text) > MAX_CAPTION:
-                await bot.send_photo(m.chat.id, file_id, **media_kwargs)
-                for part in _chunks(text, MAX_TEXT):
-                    await m.answer(part, **text_kwargs)
-            else:
-                await bot.send_photo(m.chat.id, file_id, caption=(text or None), **media_kwargs)
-
-        elif mtype == "video":
-            if text and len(text) > MAX_CAPTION:
-                await bot.send_video(m.chat.id, file_id, **media_kwargs)
-                for part in _chunks(text, MAX_TEXT):
-                    await m.answer(part, **text_kwargs)
-            else:
-                await bot.send_video(m.chat.id, file_id, caption=(text or None), **media_kwargs)
-
-        elif mtype == "document":
-            if text and len(text) > MAX_CAPTION:
-                await bot.send_document(m.chat.id, file_id, **media_kwargs)
-                for part in _chunks(text, MAX_TEXT):
-                    await m.answer(part, **text_kwargs)
-            else:
-                await bot.send_document(m.chat.id, file_id, caption=(text or None), **media_kwargs)
-
-        elif mtype == "audio":
-            if text and len(text) > MAX_CAPTION:
-                await bot.send_audio(m.chat.id, file_id, **media_kwargs)
-                for part in _chunks(text, MAX_TEXT):
-                    await m.answer(part, **text_kwargs)
-            else:
-                await bot.send_audio(m.chat.id, file_id, caption=(text or None), **media_kwargs)
-
-        elif mtype == "animation":
-            if text and len(text) > MAX_CAPTION:
-                await bot.send_animation(m.chat.id, file_id, **media_kwargs)
-                for part in _chunks(text, MAX_TEXT):
-                    await m.answer(part, **text_kwargs)
-            else:
-                await bot.send_animation(m.chat.id, file_id, caption=(text or None), **media_kwargs)
-
-        else:
-            for part in _chunks(text or "Qo‘llanmagan tur.", MAX_TEXT):
-                await m.answer(part, **text_kwargs)
+    await execute_plan(bot, m.chat.id, plan)
 
 
 # ✅ Tekshirish tugmasi (inline)
 @start_router.callback_query(F.data == "check_sub")
-async def cb_check_sub(cb: CallbackQuery, bot: Bot, state: FSMContext):
-    if not await _guard_sub_cb(cb, bot):
-        return
+async def cb_check_sub(cb: CallbackQuery, state: FSMContext):
+    # obuna SubscriptionGate'da tekshirilgan
     try:
         await cb.message.delete()
     except Exception:
@@ -235,3 +210,13 @@ async def cb_check_sub(cb: CallbackQuery, bot: Bot, state: FSMContext):
     parent_id = d.get("parent_id", None)
     await _show_level(cb.message, parent_id)
     await cb.answer("✅ Tekshirildi.")
+
+
+# ---------------------- Bot bloklandi / qayta ochildi ----------------------
+@start_router.my_chat_member(F.chat.type == "private", ChatMemberUpdatedFilter(KICKED))
+async def user_blocked_bot(ev: ChatMemberUpdated):
+    await set_user_dead(ev.from_user.id, True)
+
+@start_router.my_chat_member(F.chat.type == "private", ChatMemberUpdatedFilter(MEMBER))
+async def user_unblocked_bot(ev: ChatMemberUpdated):
+    await set_user_dead(ev.from_user.id, False)
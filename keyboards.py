@@ -1,5 +1,5 @@
 # keyboards.py
-from typing import List, Tuple, Any, Optional
+from typing import Dict, List, Tuple, Any, Optional
 from aiogram.types import (
     InlineKeyboardMarkup, InlineKeyboardButton,
     ReplyKeyboardMarkup, KeyboardButton
@@ -35,6 +35,7 @@ def channels_kb() -> InlineKeyboardMarkup:
         [InlineKeyboardButton(text="➕ Kanal qo‘shish", callback_data="ch_add_simple")],
         [InlineKeyboardButton(text="📋 Ro‘yxat",        callback_data="ch_list")],
         [InlineKeyboardButton(text="🗑 O‘chirish",      callback_data="ch_del")],
+        [InlineKeyboardButton(text="🤖 Avto-tasdiqlash", callback_data="ch_auto")],
         [InlineKeyboardButton(text="⬅️ Orqaga",        callback_data="admin_back")],
     ]
     return InlineKeyboardMarkup(inline_keyboard=rows)
@@ -71,10 +72,35 @@ def cols_kb(current: int) -> InlineKeyboardMarkup:
     rows.append([InlineKeyboardButton(text="⬅️ Orqaga", callback_data="ad_buttons")])
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
-def pick_button_kb(items: List[Tuple[int, str]], back_to: str, prefix: str) -> InlineKeyboardMarkup:
+# Katta daraxtlarda inline klaviatura Telegram limitidan oshmasin
+PICK_PAGE_SIZE = 20
+
+def page_slice(items: List[Any], page: int, size: int = PICK_PAGE_SIZE) -> Tuple[List[Any], int, int]:
+    """(sahifadagi elementlar, to‘g‘rilangan sahifa, sahifalar soni)"""
+    pages = max(1, (len(items) + size - 1) // size)
+    page = max(0, min(int(page), pages - 1))
+    return items[page * size:(page + 1) * size], page, pages
+
+def page_nav_row(prefix: str, page: int, pages: int) -> List[InlineKeyboardButton]:
+    """«◀️ 2/5 ▶️» qatori; callback: pg:<prefix>:<sahifa>. Bitta sahifa bo‘lsa — bo‘sh."""
+    if pages <= 1:
+        return []
+    row: List[InlineKeyboardButton] = []
+    if page > 0:
+        row.append(InlineKeyboardButton(text="◀️", callback_data=f"pg:{prefix}:{page - 1}"))
+    row.append(InlineKeyboardButton(text=f"{page + 1}/{pages}", callback_data="noop"))
+    if page < pages - 1:
+        row.append(InlineKeyboardButton(text="▶️", callback_data=f"pg:{prefix}:{page + 1}"))
+    return row
+
+def pick_button_kb(items: List[Tuple[int, str]], back_to: str, prefix: str, page: int = 0) -> InlineKeyboardMarkup:
+    chunk, page, pages = page_slice(items, page)
     rows: List[List[InlineKeyboardButton]] = []
-    for bid, title in items:
+    for bid, title in chunk:
         rows.append([InlineKeyboardButton(text=f"#{bid} — {title}", callback_data=f"{prefix}:{bid}")])
+    nav = page_nav_row(prefix, page, pages)
+    if nav:
+        rows.append(nav)
     rows.append([InlineKeyboardButton(text="⬅️ Orqaga", callback_data=back_to)])
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
@@ -82,11 +108,19 @@ def pick_button_kb(items: List[Tuple[int, str]], back_to: str, prefix: str) -> I
 def users_menu_kb() -> InlineKeyboardMarkup:
     rows = [
         [InlineKeyboardButton(text="📊 Statistika",    callback_data="u_stats")],
-        [InlineKeyboardButton(text="📤 Excel eksport", callback_data="u_export")],
+        [InlineKeyboardButton(text="📤 Eksport",       callback_data="u_export")],
         [InlineKeyboardButton(text="⬅️ Orqaga",        callback_data="admin_back")],
     ]
     return InlineKeyboardMarkup(inline_keyboard=rows)
 
+def export_format_kb() -> InlineKeyboardMarkup:
+    rows = [
+        [InlineKeyboardButton(text="📗 Excel (.xlsx)",  callback_data="u_export:xlsx")],
+        [InlineKeyboardButton(text="🗜 CSV (.csv.gz)", callback_data="u_export:csv")],
+        [InlineKeyboardButton(text="⬅️ Orqaga",        callback_data="ad_users")],
+    ]
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
 def admins_menu_kb() -> InlineKeyboardMarkup:
     rows = [
         [InlineKeyboardButton(text="📋 Ro‘yxat",  callback_data="adm_list")],
@@ -124,3 +158,25 @@ def reply_menu_kb(btns: List[Tuple[int, str]], cols: int, with_back: bool = Fals
     if with_back:
         rows.append([KeyboardButton(text="⬅️ Orqaga")])
     return ReplyKeyboardMarkup(keyboard=rows, resize_keyboard=True, one_time_keyboard=False)
+
+
+# Tayyor menyu klaviaturalari keshi: (parent_id, cols) -> markup.
+# Daraxt versiyasi o‘zgarsa (tugma qo‘shildi/o‘chirildi/...) kesh tozalanadi;
+# ustunlar soni kalitda bo‘lgani uchun set_menu_cols ham avtomatik hisobga olinadi.
+MENU_CACHE_SIZE = 2048
+_menu_cache: Dict[Tuple[Optional[int], int], ReplyKeyboardMarkup] = {}
+_menu_cache_version: Optional[int] = None
+
+def cached_reply_menu_kb(parent_id: Optional[int], btns: List[Tuple[int, str]],
+                         cols: int, version: int) -> ReplyKeyboardMarkup:
+    global _menu_cache_version
+    if version != _menu_cache_version:
+        _menu_cache.clear()
+        _menu_cache_version = version
+    key = (parent_id, cols)
+    kb = _menu_cache.get(key)
+    if kb is None:
+        kb = reply_menu_kb(btns, cols, with_back=(parent_id is not None))
+        if len(_menu_cache) < MENU_CACHE_SIZE:
+            _menu_cache[key] = kb
+    return kb
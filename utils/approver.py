@@ -0,0 +1,110 @@
+# utils/approver.py
+# Join-request'larni avtomatik tasdiqlash: approve_queue (DB) navbatidan o‘qiydi,
+# token-bucket bilan approve_chat_join_request chaqiradi. Navbat DB'da bo‘lgani
+# uchun restartdan keyin ham davom etadi; cluster rejimida faqat bitta ishchida.
+from __future__ import annotations
+import asyncio
+import os
+import time
+from typing import List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramRetryAfter, TelegramNetworkError, TelegramForbiddenError, TelegramBadRequest,
+)
+
+from db import fetch_approvals, mark_approvals, prune_approvals, prune_join_requests
+from utils.ratelimit import TokenBucket
+
+APPROVE_RATE = float(os.getenv("APPROVE_RATE", "20") or 20)
+APPROVE_WORKERS = int(os.getenv("APPROVE_WORKERS", "4") or 4)
+APPROVE_BATCH = 200
+IDLE_POLL = 2.0          # navbat bo‘sh bo‘lsa necha sekundda qayta qarash
+KEEP_DONE = 86400        # bajarilganlar statistika uchun shuncha saqlanadi
+PRUNE_EVERY = 3600       # eski navbat va join_requests yozuvlarini tozalash oralig‘i
+
+_bucket = TokenBucket(APPROVE_RATE)
+_wake = asyncio.Event()
+_task: Optional[asyncio.Task] = None
+
+
+def notify() -> None:
+    """Yangi so‘rov navbatga tushdi — ishchini uyg‘otadi (shu jarayonda bo‘lsa)."""
+    _wake.set()
+
+
+async def _approve(bot: Bot, chat_id: str, user_id: int) -> str:
+    while True:
+        await _bucket.acquire()
+        try:
+            await bot.approve_chat_join_request(chat_id=int(chat_id), user_id=user_id)
+            return "ok"
+        except TelegramRetryAfter as e:
+            _bucket.pause(e.retry_after)
+        except TelegramBadRequest as e:
+            # USER_ALREADY_PARTICIPANT — allaqachon a’zo; boshqalari (HIDE_REQUESTER_MISSING, ...) qaytarilmaydi
+            return "ok" if "already" in str(e).lower() else "fail"
+        except TelegramForbiddenError:
+            return "fail"   # bot kanal admini emas
+        except TelegramNetworkError:
+            return "retry"
+        except Exception:
+            return "retry"
+
+
+async def _drain(bot: Bot) -> int:
+    batch = await fetch_approvals(APPROVE_BATCH)
+    if not batch:
+        return 0
+    sem = asyncio.Semaphore(APPROVE_WORKERS)
+    results: List[Tuple[str, int, str]] = []
+
+    async def one(chat_id: str, user_id: int) -> None:
+        async with sem:
+            results.append((chat_id, user_id, await _approve(bot, chat_id, user_id)))
+
+    try:
+        await asyncio.gather(*(one(c, u) for c, u in batch))
+    finally:
+        await mark_approvals(results)
+    if all(st == "retry" for _c, _u, st in results):
+        await asyncio.sleep(IDLE_POLL)   # tarmoq yo‘q — navbatni aylantirib yubormaymiz
+    return len(batch)
+
+
+async def _run(bot: Bot) -> None:
+    last_prune = 0.0
+    while True:
+        try:
+            n = await _drain(bot)
+            if time.monotonic() - last_prune > PRUNE_EVERY:
+                last_prune = time.monotonic()
+                await prune_approvals(int(time.time()) - KEEP_DONE)
+                await prune_join_requests()    # JOIN_REQUEST_TTL'dan eskilari
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[approver] xato: {e!r}")
+            n = 0
+        if n:
+            continue
+        _wake.clear()
+        try:
+            await asyncio.wait_for(_wake.wait(), IDLE_POLL)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_approver(bot: Bot) -> asyncio.Task:
+    global _task
+    if _task is None or _task.done():
+        _task = asyncio.create_task(_run(bot), name="approver")
+    return _task
+
+
+async def stop_approver() -> None:
+    global _task
+    if _task is not None:
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+        _task = None
@@ -0,0 +1,196 @@
+# utils/broadcast.py
+# Reklama yuborish: DB'da saqlanadigan, qayta ishga tushganda davom etadigan ishlar.
+from __future__ import annotations
+import asyncio
+import os
+import time
+from typing import Dict, List, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramRetryAfter, TelegramNetworkError, TelegramForbiddenError, TelegramBadRequest,
+)
+
+from db import (
+    create_broadcast, get_broadcast, list_unfinished_broadcasts,
+    set_broadcast_progress_msg, finish_broadcast,
+    fetch_pending_deliveries, mark_deliveries, broadcast_counts,
+)
+from utils.ratelimit import TokenBucket
+
+BROADCAST_WORKERS = int(os.getenv("BROADCAST_WORKERS", "8") or 8)
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "25") or 25)  # Bot API: ~30 msg/s
+PROGRESS_EVERY = 5.0     # progress xabarini necha sekundda yangilash
+FLUSH_EVERY = 1.0        # natijalarni DB'ga yozish oralig'i
+FLUSH_SIZE = 500
+PAGE_SIZE = 500
+NET_RETRIES = 3
+
+_bucket = TokenBucket(BROADCAST_RATE)
+_jobs: Dict[int, asyncio.Task] = {}
+_pending: Dict[int, int] = {}    # broadcast_id -> hali yuborilmaganlar soni
+
+
+def running_jobs() -> List[int]:
+    return [bid for bid, t in _jobs.items() if not t.done()]
+
+
+def queue_depth() -> int:
+    """Ishlayotgan reklamalarda yuborilishi kutilayotgan foydalanuvchilar."""
+    return sum(_pending.values())
+
+
+def _progress_text(bid: int, c: dict, total: int, done: bool = False) -> str:
+    head = "✅ Reklama yakunlandi" if done else "📣 Reklama yuborilmoqda"
+    dead = c.get("dead", 0)
+    sent = c["ok"] + c["fail"] + dead
+    return (f"{head} (#{bid})\n"
+            f"📤 {sent}/{total}\n"
+            f"✅ Yuborildi: {c['ok']} ta\n"
+            f"⚠️ Yuborilmadi: {c['fail']} ta\n"
+            f"🚫 Bloklagan: {dead} ta")
+
+
+async def _edit_progress(bot: Bot, bid: int, done: bool = False) -> None:
+    row = await get_broadcast(bid)
+    if not row:
+        return
+    _id, _from, _mid, admin_chat_id, progress_msg_id, _status, total = row
+    text = _progress_text(bid, await broadcast_counts(bid), int(total), done)
+    if done:
+        text += "\n/admin"
+    if progress_msg_id:
+        try:
+            await bot.edit_message_text(text, chat_id=admin_chat_id, message_id=progress_msg_id)
+            return
+        except Exception:
+            pass  # "not modified" yoki xabar o‘chirilgan
+        if not done:
+            return
+    try:
+        msg = await bot.send_message(admin_chat_id, text)
+        await set_broadcast_progress_msg(bid, msg.message_id)
+    except Exception:
+        pass
+
+
+_DEAD_MARKERS = ("chat not found", "user is deactivated", "bot was blocked", "user not found")
+
+
+def _is_dead_chat_error(e: Exception) -> bool:
+    msg = str(e).lower()
+    return any(x in msg for x in _DEAD_MARKERS)
+
+
+async def _deliver(bot: Bot, uid: int, from_chat_id: int, message_id: int) -> str:
+    attempts = 0
+    while True:
+        await _bucket.acquire()
+        try:
+            await bot.copy_message(chat_id=uid, from_chat_id=from_chat_id, message_id=message_id)
+            return "ok"
+        except TelegramRetryAfter as e:
+            _bucket.pause(e.retry_after)
+        except TelegramForbiddenError:
+            return "dead"  # bloklagan yoki akkaunt o‘chirilgan
+        except TelegramBadRequest as e:
+            return "dead" if _is_dead_chat_error(e) else "fail"
+        except TelegramNetworkError:
+            attempts += 1
+            if attempts >= NET_RETRIES:
+                return "fail"
+            await asyncio.sleep(attempts)
+        except Exception:
+            return "fail"
+
+
+async def _run(bot: Bot, bid: int) -> None:
+    row = await get_broadcast(bid)
+    if not row:
+        return
+    from_chat_id, message_id = int(row[1]), int(row[2])
+    _pending[bid] = (await broadcast_counts(bid))["pending"]
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=BROADCAST_WORKERS * 4)
+    results: List[Tuple[int, str]] = []
+
+    async def flush() -> None:
+        if results:
+            batch = results[:]
+            results.clear()
+            await mark_deliveries(bid, batch)
+
+    async def feeder() -> None:
+        last = 0
+        while True:
+            page = await fetch_pending_deliveries(bid, last, PAGE_SIZE)
+            if not page:
+                break
+            for uid in page:
+                await queue.put(uid)
+            last = page[-1]
+        for _ in range(BROADCAST_WORKERS):
+            await queue.put(None)
+
+    async def worker() -> None:
+        while True:
+            uid = await queue.get()
+            if uid is None:
+                return
+            results.append((uid, await _deliver(bot, uid, from_chat_id, message_id)))
+            _pending[bid] -= 1
+            if len(results) >= FLUSH_SIZE:
+                await flush()
+
+    async def ticker() -> None:
+        last_progress = time.monotonic()
+        while True:
+            await asyncio.sleep(FLUSH_EVERY)
+            await flush()
+            if time.monotonic() - last_progress >= PROGRESS_EVERY:
+                last_progress = time.monotonic()
+                await _edit_progress(bot, bid)
+
+    tick = asyncio.create_task(ticker())
+    try:
+        await asyncio.gather(feeder(), *(worker() for _ in range(BROADCAST_WORKERS)))
+    finally:
+        tick.cancel()
+        _pending.pop(bid, None)
+        await flush()
+    await finish_broadcast(bid)
+    await _edit_progress(bot, bid, done=True)
+
+
+def _launch(bot: Bot, bid: int) -> asyncio.Task:
+    task = asyncio.create_task(_run(bot, bid), name=f"broadcast-{bid}")
+    _jobs[bid] = task
+    task.add_done_callback(lambda _t: _jobs.pop(bid, None))
+    return task
+
+
+async def start_broadcast(bot: Bot, from_chat_id: int, message_id: int, admin_chat_id: int) -> int:
+    """Yangi ish yaratadi, progress xabarini yuboradi va fon ishchilarini ishga tushiradi."""
+    bid = await create_broadcast(from_chat_id, message_id, admin_chat_id)
+    row = await get_broadcast(bid)
+    msg = await bot.send_message(admin_chat_id, _progress_text(bid, {"ok": 0, "fail": 0}, int(row[6])))
+    await set_broadcast_progress_msg(bid, msg.message_id)
+    _launch(bot, bid)
+    return bid
+
+
+async def resume_broadcasts(bot: Bot) -> List[int]:
+    """Startup'da tugallanmagan ishlarni davom ettiradi."""
+    ids = await list_unfinished_broadcasts()
+    for bid in ids:
+        if bid not in _jobs:
+            _launch(bot, bid)
+    return ids
+
+
+async def stop_broadcasts() -> None:
+    """Shutdown: ishlarni to‘xtatadi (holat DB'da qoladi, keyingi startda davom etadi)."""
+    tasks = list(_jobs.values())
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,156 @@
+# utils/delivery.py
+# Tugma kontentini yuborish rejasi. Har bir tugmaning kontenti bir marta
+# o‘zgarmas operatsiyalar ro‘yxatiga kompilyatsiya qilinadi va button_id bo‘yicha
+# keshlanadi; ketma-ket mos media'lar send_media_group (10 tagacha) bilan
+# birlashtiriladi, tartib o‘zgarmaydi.
+from __future__ import annotations
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+from aiogram import Bot
+from aiogram.types import (
+    InputMediaAudio, InputMediaDocument, InputMediaPhoto, InputMediaVideo,
+)
+
+from db import list_button_contents, cache_generation
+
+MAX_TEXT = 4096
+MAX_CAPTION = 1024
+MEDIA_GROUP_MAX = 10
+PLAN_CACHE_SIZE = 4096
+
+# Bitta albomga tusha oladigan turlar: photo+video birga, document va audio alohida.
+# animation va text albomga qo‘shilmaydi.
+_GROUP_KIND = {"photo": "visual", "video": "visual", "document": "document", "audio": "audio"}
+
+_INPUT_MEDIA = {
+    "photo": InputMediaPhoto,
+    "video": InputMediaVideo,
+    "document": InputMediaDocument,
+    "audio": InputMediaAudio,
+}
+
+_SEND_ONE = {
+    "photo": "send_photo",
+    "video": "send_video",
+    "document": "send_document",
+    "audio": "send_audio",
+    "animation": "send_animation",
+}
+
+
+class SendText(NamedTuple):
+    text: str
+
+
+class SendMedia(NamedTuple):
+    method: str                 # Bot metodi nomi: send_photo, send_video, ...
+    file_id: str
+    caption: Optional[str]
+
+
+class SendGroup(NamedTuple):
+    media: tuple                # tayyor InputMedia* obyektlari
+
+
+Op = Union[SendText, SendMedia, SendGroup]
+Plan = Tuple[Op, ...]
+
+
+def split_text(s: str, n: int = MAX_TEXT) -> List[str]:
+    """Matnni n belgigacha bo‘laklarga bo‘ladi: avval qator, keyin so‘z chegarasida."""
+    parts: List[str] = []
+    while len(s) > n:
+        cut = s.rfind("\n", 0, n + 1)
+        if cut <= 0:
+            cut = s.rfind(" ", 0, n + 1)
+        if cut <= 0:
+            cut = n
+        parts.append(s[:cut].rstrip())
+        s = s[cut:].lstrip()
+    if s or not parts:
+        parts.append(s)
+    return [p for p in parts if p] or [s]
+
+
+def compile_plan(items: Iterable[Tuple[int, str, Optional[str], Optional[str]]]) -> Plan:
+    """
+    button_contents qatorlaridan (id, media_type, file_id, caption) yuborish
+    rejasini tuzadi. Uzun caption (> MAX_CAPTION) media'siz matn bo‘lib
+    albomdan keyin yuboriladi va albom shu yerda yopiladi — tartib saqlanadi.
+    """
+    plan: List[Op] = []
+    group: List[Tuple[str, str, Optional[str]]] = []
+    group_kind: Optional[str] = None
+
+    def close_group() -> None:
+        nonlocal group_kind
+        if len(group) == 1:
+            mtype, file_id, caption = group[0]
+            plan.append(SendMedia(_SEND_ONE[mtype], file_id, caption))
+        elif group:
+            plan.append(SendGroup(tuple(
+                _INPUT_MEDIA[mtype](media=file_id, caption=caption, parse_mode=None)
+                for mtype, file_id, caption in group
+            )))
+        group.clear()
+        group_kind = None
+
+    for _id, mtype, file_id, caption in items:
+        text = (caption or "").strip()
+
+        if mtype == "text" or mtype not in _SEND_ONE or not file_id:
+            close_group()
+            fallback = " " if mtype == "text" else "Qo‘llanmagan tur."
+            plan.extend(SendText(part) for part in split_text(text or fallback))
+            continue
+
+        overflow = bool(text) and len(text) > MAX_CAPTION
+        cap = None if overflow else (text or None)
+        kind = _GROUP_KIND.get(mtype)
+
+        if kind is None:
+            close_group()
+            plan.append(SendMedia(_SEND_ONE[mtype], file_id, cap))
+        else:
+            if kind != group_kind or len(group) >= MEDIA_GROUP_MAX:
+                close_group()
+            group.append((mtype, file_id, cap))
+            group_kind = kind
+            if overflow:
+                close_group()
+
+        if overflow:
+            plan.extend(SendText(part) for part in split_text(text))
+
+    close_group()
+    return tuple(plan)
+
+
+# ============== Kesh ==============
+# Admin kontent qo‘shsa/o‘chirsa db.cache_generation() o‘zgaradi — kesh tozalanadi.
+_plans: Dict[int, Plan] = {}
+_plans_gen: Optional[int] = None
+
+
+async def get_plan(button_id: int) -> Plan:
+    global _plans_gen
+    gen = cache_generation()
+    if gen != _plans_gen:
+        _plans.clear()
+        _plans_gen = gen
+    plan = _plans.get(button_id)
+    if plan is None:
+        plan = compile_plan(await list_button_contents(button_id))
+        if cache_generation() == gen and len(_plans) < PLAN_CACHE_SIZE:
+            _plans[button_id] = plan
+    return plan
+
+
+async def execute_plan(bot: Bot, chat_id: int, plan: Iterable[Op]) -> None:
+    for op in plan:
+        if type(op) is SendText:
+            await bot.send_message(chat_id, op.text, parse_mode=None, disable_web_page_preview=True)
+        elif type(op) is SendMedia:
+            await getattr(bot, op.method)(chat_id, op.file_id, caption=op.caption, parse_mode=None)
+        else:
+            await bot.send_media_group(chat_id, media=list(op.media))
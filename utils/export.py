@@ -0,0 +1,59 @@
+# utils/export.py
+# Foydalanuvchilar eksporti: DB'dan bo'laklab o'qiladi, worker thread'da
+# vaqtinchalik faylga yoziladi — RAM'da butun jadval ushlanmaydi.
+from __future__ import annotations
+import asyncio
+import csv
+import gzip
+import os
+import tempfile
+
+from db import iter_users_sync, USER_EXPORT_COLUMNS
+
+EXPORT_CHUNK = 2000
+
+# format -> fayl kengaytmasi
+FORMATS = {
+    "xlsx": ".xlsx",
+    "csv": ".csv.gz",
+}
+
+
+def _write_xlsx(path: str) -> None:
+    from openpyxl import Workbook  # og‘ir kutubxona — faqat kerak bo‘lganda
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("users")
+    ws.append(list(USER_EXPORT_COLUMNS))
+    for rows in iter_users_sync(EXPORT_CHUNK):
+        for r in rows:
+            ws.append(list(r))
+    wb.save(path)
+
+
+def _write_csv_gz(path: str) -> None:
+    with gzip.open(path, "wt", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(USER_EXPORT_COLUMNS)
+        for rows in iter_users_sync(EXPORT_CHUNK):
+            w.writerows(rows)
+
+
+_WRITERS = {"xlsx": _write_xlsx, "csv": _write_csv_gz}
+
+
+async def export_users(fmt: str = "xlsx") -> str:
+    """
+    Eksport faylini vaqtinchalik papkada yaratib, yo‘lini qaytaradi.
+    Faylni yuborgandan keyin chaqiruvchi o‘chirishi kerak.
+    """
+    if fmt not in _WRITERS:
+        raise ValueError(f"Noma’lum format: {fmt}")
+    fd, path = tempfile.mkstemp(prefix="users_", suffix=FORMATS[fmt])
+    os.close(fd)
+    try:
+        await asyncio.to_thread(_WRITERS[fmt], path)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
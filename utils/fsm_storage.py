@@ -0,0 +1,187 @@
+# utils/fsm_storage.py
+# aiogram FSM uchun SQLite storage: oldida LRU kesh, yozuvlar jamlanib
+# (write coalescing) fon vazifasida yoziladi, uzoq turib qolgan holatlar o‘chadi.
+# "Turib qolgan" — oxirgi murojaatdan (o‘qish yoki yozish) beri FSM_TTL o‘tgan.
+from __future__ import annotations
+import asyncio
+import copy
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, Optional, Set
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from db import fsm_load, fsm_save_many, fsm_expire
+
+FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", "20000") or 20000)
+FSM_TTL = int(os.getenv("FSM_TTL", str(30 * 24 * 3600)) or 30 * 24 * 3600)   # sekund
+FSM_FLUSH_EVERY = float(os.getenv("FSM_FLUSH_MS", "500") or 500) / 1000
+FSM_EXPIRE_EVERY = 3600.0
+
+
+class _Entry:
+    __slots__ = ("state", "data", "touched", "saved")
+
+    def __init__(self, state: Optional[str], data: Dict[str, Any], saved: int = 0):
+        self.state = state
+        self.data = data
+        self.touched = time.time()   # oxirgi o‘qish/yozish
+        self.saved = saved           # DB'dagi updated_at
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    Holatlar `fsm_states` jadvalida saqlanadi, shuning uchun restart/deploy'dan
+    keyin ham yo‘qolmaydi. Kesh faqat shu jarayonniki: bir nechta jarayon
+    ishlatilsa, bitta foydalanuvchi doim bitta jarayonga tushishi kerak.
+    """
+
+    def __init__(self, cache_size: int = FSM_CACHE_SIZE, ttl: int = FSM_TTL,
+                 flush_every: float = FSM_FLUSH_EVERY):
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self.flush_every = flush_every
+        self._cache: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._dirty: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        return ":".join((
+            str(key.bot_id), str(key.chat_id), str(key.user_id),
+            str(key.thread_id or ""), key.business_connection_id or "", key.destiny,
+        ))
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def __bool__(self) -> bool:
+        # Dispatcher(storage=...) `storage or MemoryStorage()` qiladi — bo‘sh kesh False bo‘lmasin
+        return True
+
+    @property
+    def dirty(self) -> int:
+        """DB'ga hali yozilmagan o‘zgarishlar soni."""
+        return len(self._dirty)
+
+    # ---------- kesh ----------
+    async def _entry(self, key: StorageKey) -> _Entry:
+        k = self._key(key)
+        e = self._cache.get(k)
+        if e is not None:
+            if k in self._dirty or time.time() - e.touched < self.ttl:
+                self._cache.move_to_end(k)
+                self._seen(k, e)
+                return e
+            del self._cache[k]          # eskirgan — DB'dan qayta o‘qiymiz
+        row = await fsm_load(k)
+        e = self._cache.get(k)          # kutish paytida boshqa coroutine yuklagan bo‘lishi mumkin
+        if e is None:
+            state, data, saved = row if row else (None, None, 0)
+            e = _Entry(state, json.loads(data) if data else {}, saved)
+            self._cache[k] = e
+        self._cache.move_to_end(k)
+        self._seen(k, e)
+        self._evict(keep=k)
+        return e
+
+    def _seen(self, k: str, e: _Entry) -> None:
+        """
+        Murojaat vaqtini yangilaydi. DB'dagi updated_at ttl/2 dan eskirgan bo‘lsa
+        u ham yoziladi — faqat o‘qilayotgan holat fsm_expire'ga tushmasin
+        (faol foydalanuvchi uchun ttl/2 da ko‘pi bilan bitta yozuv).
+        """
+        e.touched = time.time()
+        if (e.state is not None or e.data) and e.touched - e.saved > self.ttl / 2:
+            self._dirty.add(k)
+            self._ensure_task()
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        # yozilmagan (dirty) yozuvlarni chiqarmaymiz — flush'dan keyin chiqadi
+        while len(self._cache) > self.cache_size:
+            for k in self._cache:
+                if k not in self._dirty and k != keep:
+                    del self._cache[k]
+                    break
+            else:
+                return
+
+    def _touch(self, key: StorageKey, e: _Entry) -> None:
+        e.touched = time.time()
+        self._dirty.add(self._key(key))
+        self._ensure_task()
+
+    # ---------- BaseStorage ----------
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        e = await self._entry(key)
+        e.state = state.state if isinstance(state, State) else state
+        self._touch(key, e)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._entry(key)).state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        e = await self._entry(key)
+        e.data = copy.deepcopy(dict(data))
+        self._touch(key, e)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return copy.deepcopy((await self._entry(key)).data)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    # ---------- fon yozuvchi ----------
+    async def flush(self) -> None:
+        if not self._dirty:
+            return
+        keys, self._dirty = self._dirty, set()
+        rows, deleted = [], []
+        for k in keys:
+            e = self._cache.get(k)
+            if e is None:
+                continue
+            if e.state is None and not e.data:
+                deleted.append(k)
+            else:
+                rows.append((k, e.state, json.dumps(e.data, ensure_ascii=False), int(e.touched)))
+        try:
+            await fsm_save_many(rows, deleted)
+        except BaseException:
+            self._dirty |= keys
+            raise
+        for k, _state, _data, ts in rows:
+            e = self._cache.get(k)
+            if e is not None:
+                e.saved = ts
+        self._evict()
+
+    def _ensure_task(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop(), name="fsm-storage-flush")
+
+    async def _loop(self) -> None:
+        last_expire = 0.0
+        while True:
+            await asyncio.sleep(self.flush_every)
+            try:
+                await self.flush()
+                now = time.time()
+                if now - last_expire >= FSM_EXPIRE_EVERY:
+                    last_expire = now
+                    await fsm_expire(int(now - self.ttl))
+                    for k in [k for k, e in self._cache.items()
+                              if k not in self._dirty and now - e.touched >= self.ttl]:
+                        del self._cache[k]
+            except Exception as e:
+                print(f"[fsm] flush xatosi: {e!r}")
@@ -0,0 +1,212 @@
+# utils/metrics.py
+# Prometheus text formatidagi metrikalar: handler'lar, DB va Bot API chaqiruvlari.
+# METRICS_PORT berilganda yoqiladi (bo‘lmasa hech narsa o‘rnatilmaydi):
+#   install(dp, bot, storage)  — middleware'lar, DB ilgagi, gauge'lar
+#   await start_server()       — GET /metrics (standart 127.0.0.1)
+from __future__ import annotations
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.types import TelegramObject
+
+import db
+from utils.broadcast import queue_depth, running_jobs
+from utils.subscription import subscription_cache_stats
+
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0") or 0)   # 0 — o‘chirilgan
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[str, ...]
+
+
+def _esc(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(names: Labels, values: Labels, extra: str = "") -> str:
+    parts = [f'{n}="{_esc(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+class Counter:
+    def __init__(self, name: str, doc: str, labels: Labels = ()):
+        self.name, self.doc, self.labels = name, doc, labels
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.doc}"
+        yield f"# TYPE {self.name} counter"
+        for lv, v in self._values.items():
+            yield f"{self.name}{_fmt_labels(self.labels, lv)} {_num(v)}"
+
+
+class Histogram:
+    def __init__(self, name: str, doc: str, labels: Labels = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name, self.doc, self.labels, self.buckets = name, doc, labels, buckets
+        self._values: Dict[Labels, List[float]] = {}   # [bucket_1..n, +Inf, sum]
+
+    def observe(self, value: float, *labels: str) -> None:
+        row = self._values.get(labels)
+        if row is None:
+            row = self._values[labels] = [0.0] * (len(self.buckets) + 2)
+        for i, b in enumerate(self.buckets):
+            if value <= b:
+                row[i] += 1
+                break
+        else:
+            row[len(self.buckets)] += 1
+        row[-1] += value
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.doc}"
+        yield f"# TYPE {self.name} histogram"
+        for lv, row in self._values.items():
+            acc = 0.0
+            for b, n in zip(self.buckets + (float("inf"),), row):
+                acc += n
+                le = 'le="+Inf"' if b == float("inf") else f'le="{b!r}"'
+                yield f"{self.name}_bucket{_fmt_labels(self.labels, lv, le)} {_num(acc)}"
+            yield f"{self.name}_sum{_fmt_labels(self.labels, lv)} {_num(row[-1])}"
+            yield f"{self.name}_count{_fmt_labels(self.labels, lv)} {_num(acc)}"
+
+
+class Gauge:
+    """Qiymat scrape paytida fn() dan olinadi (kind="counter" — tashqi hisoblagich)."""
+
+    def __init__(self, name: str, doc: str, fn: Callable[[], float], kind: str = "gauge"):
+        self.name, self.doc, self.fn, self.kind = name, doc, fn, kind
+
+    def render(self) -> Iterator[str]:
+        try:
+            value = float(self.fn())
+        except Exception:
+            return
+        yield f"# HELP {self.name} {self.doc}"
+        yield f"# TYPE {self.name} {self.kind}"
+        yield f"{self.name} {_num(value)}"
+
+
+# ============== Metrikalar ==============
+HANDLER_SECONDS = Histogram("bot_handler_seconds", "Handler ishlash vaqti", ("event", "handler"))
+HANDLER_ERRORS = Counter("bot_handler_errors_total", "Handler'dagi istisnolar", ("event", "handler", "error"))
+DB_SECONDS = Histogram("bot_db_seconds", "DB ulanishini olishdan bo‘shatishgacha vaqt", ("caller", "kind"))
+API_SECONDS = Histogram("bot_api_seconds", "Bot API so‘rovi vaqti", ("method",))
+API_REQUESTS = Counter("bot_api_requests_total", "Bot API so‘rovlari natija bo‘yicha", ("method", "outcome"))
+API_RETRY_AFTER = Counter("bot_api_retry_after_total", "RetryAfter (429) javoblari", ("method",))
+
+_metrics: List[Any] = [HANDLER_SECONDS, HANDLER_ERRORS, DB_SECONDS, API_SECONDS, API_REQUESTS, API_RETRY_AFTER]
+
+
+def gauge(name: str, doc: str, fn: Callable[[], float], kind: str = "gauge") -> None:
+    _metrics.append(Gauge(name, doc, fn, kind))
+
+
+def render() -> str:
+    return "\n".join(line for m in _metrics for line in m.render()) + "\n"
+
+
+# ============== Yig‘uvchilar ==============
+class HandlerMetrics(BaseMiddleware):
+    """Dispatcher observer'lariga inner middleware: har bir handler vaqti va xatolari."""
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: Dict[str, Any]) -> Any:
+        obj = data.get("handler")
+        cb = getattr(obj, "callback", None)
+        name = getattr(cb, "__qualname__", None) or "?"
+        kind = type(event).__name__
+        t0 = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            HANDLER_ERRORS.inc(kind, name, type(e).__name__)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - t0, kind, name)
+
+
+class ApiMetrics(BaseRequestMiddleware):
+    """bot.session middleware: Bot API chaqiruvlari metod va natija bo‘yicha."""
+
+    async def __call__(self, make_request, bot: Bot, method):
+        name = type(method).__name__
+        if name == "GetUpdates":   # long polling kutishi vaqtni buzadi
+            return await make_request(bot, method)
+        t0 = time.perf_counter()
+        outcome = "ok"
+        try:
+            return await make_request(bot, method)
+        except TelegramRetryAfter:
+            outcome = "retry_after"
+            API_RETRY_AFTER.inc(name)
+            raise
+        except Exception as e:
+            outcome = type(e).__name__
+            raise
+        finally:
+            API_SECONDS.observe(time.perf_counter() - t0, name)
+            API_REQUESTS.inc(name, outcome)
+
+
+def _observe_db(caller: str, kind: str, seconds: float) -> None:
+    DB_SECONDS.observe(seconds, caller, kind)
+
+
+def _hit_ratio() -> float:
+    st = subscription_cache_stats()
+    total = st["hits"] + st["misses"]
+    return st["hits"] / total if total else 0.0
+
+
+def install(dp: Dispatcher, bot: Bot, storage: Any = None) -> None:
+    mw = HandlerMetrics()
+    for name, observer in dp.observers.items():
+        if name not in ("update", "error"):
+            observer.middleware(mw)
+    bot.session.middleware(ApiMetrics())
+    db.set_db_observer(_observe_db)
+
+    gauge("bot_sub_cache_hits_total", "Obuna keshidan topilganlar",
+          lambda: subscription_cache_stats()["hits"], "counter")
+    gauge("bot_sub_cache_misses_total", "Obuna keshida yo‘qlar",
+          lambda: subscription_cache_stats()["misses"], "counter")
+    gauge("bot_sub_cache_hit_ratio", "Obuna keshi hit ulushi", _hit_ratio)
+    gauge("bot_sub_cache_entries", "Obuna keshidagi yozuvlar", lambda: subscription_cache_stats()["entries"])
+    gauge("bot_broadcast_jobs", "Ishlayotgan reklamalar", lambda: len(running_jobs()))
+    gauge("bot_broadcast_pending", "Reklama navbatidagi foydalanuvchilar", queue_depth)
+    gauge("bot_user_write_buffer", "DB'ga yozilishi kutilayotgan foydalanuvchilar", lambda: len(db._user_buf))
+    if storage is not None:
+        gauge("bot_fsm_cache_entries", "FSM keshidagi holatlar", lambda: len(storage))
+        gauge("bot_fsm_dirty_entries", "FSM: DB'ga yozilmagan holatlar", lambda: storage.dirty)
+
+
+async def start_server(port: Optional[int] = None, host: str = METRICS_HOST):
+    """GET /metrics serverini ishga tushiradi; runner'ni qaytaradi (to‘xtatish: await runner.cleanup())."""
+    from aiohttp import web
+
+    async def handle(_request: web.Request) -> web.Response:
+        return web.Response(body=render().encode("utf-8"),
+                            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port if port is not None else METRICS_PORT).start()
+    print(f"Metrikalar: http://{host}:{port if port is not None else METRICS_PORT}/metrics")
+    return runner
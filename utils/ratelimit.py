@@ -0,0 +1,39 @@
+# utils/ratelimit.py
+from __future__ import annotations
+import asyncio
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Oddiy token-bucket: sekundiga `rate` ta ruxsat, `capacity` gacha jamlanadi.
+    pause() — RetryAfter kelganda barcha ishchilarni birdan to‘xtatib turadi.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self._tokens = self.capacity
+        self._stamp = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + float(seconds))
+        self._tokens = 0.0
+        self._stamp = self._paused_until
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
@@ -1,2 +0,0 @@
-# user_id -> set(chat_id)  (join-request yuborganlarini belgilaymiz)
-user_join_requests: dict[int, set[str]] = {}
@@ -1,41 +1,185 @@
 # utils/subscription.py
 from __future__ import annotations
-from typing import List, Tuple, Optional
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, Set, Tuple, Optional
 from aiogram import Bot
 from aiogram.enums import ChatMemberStatus
 
-from db import list_channels_full
+from db import list_channels_full, pending_join_chats
 
-async def _is_subscribed(bot: Bot, user_id: int, chat_id: int) -> bool:
+# ============== Obuna keshi ==============
+# (user_id, chat_id) -> (natija, tugash vaqti). Ijobiy va salbiy natijalar
+# uchun alohida TTL; hajm oshsa eng eski yozuv (LRU) chiqariladi.
+SUB_TTL_OK = float(os.getenv("SUB_TTL_OK", "300") or 300)
+SUB_TTL_FAIL = float(os.getenv("SUB_TTL_FAIL", "20") or 20)
+SUB_CACHE_SIZE = int(os.getenv("SUB_CACHE_SIZE", "50000") or 50000)
+
+_Key = Tuple[int, int]
+
+class _SubCache:
+    def __init__(self, maxsize: int, ttl_ok: float, ttl_fail: float):
+        self.maxsize = maxsize
+        self.ttl_ok = ttl_ok
+        self.ttl_fail = ttl_fail
+        self._data: "OrderedDict[_Key, Tuple[bool, float]]" = OrderedDict()
+        self._by_user: Dict[int, Set[_Key]] = {}   # invalidate_user butun keshni aylanmasin
+        self._inflight: Dict[_Key, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: _Key) -> Optional[bool]:
+        hit = self._data.get(key)
+        if hit is None:
+            self.misses += 1
+            return None
+        value, expires = hit
+        if expires < time.monotonic():
+            self._drop(key)
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: _Key, value: bool) -> None:
+        ttl = self.ttl_ok if value else self.ttl_fail
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._data.move_to_end(key)
+        self._by_user.setdefault(key[0], set()).add(key)
+        while len(self._data) > self.maxsize:
+            old, _ = self._data.popitem(last=False)
+            self._unindex(old)
+
+    def _unindex(self, key: _Key) -> None:
+        keys = self._by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[key[0]]
+
+    def _drop(self, key: _Key) -> None:
+        del self._data[key]
+        self._unindex(key)
+
+    def invalidate_user(self, user_id: int) -> None:
+        for key in self._by_user.pop(user_id, ()):
+            del self._data[key]
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._by_user.clear()
+
+_cache = _SubCache(SUB_CACHE_SIZE, SUB_TTL_OK, SUB_TTL_FAIL)
+
+def invalidate_subscription(user_id: int) -> None:
+    """Foydalanuvchining keshlangan natijalarini o‘chiradi (masalan, «✅ Tekshirish»da)."""
+    _cache.invalidate_user(int(user_id))
+
+def clear_subscription_cache() -> None:
+    _cache.clear()
+
+def subscription_cache_stats() -> Dict[str, int]:
+    return {"hits": _cache.hits, "misses": _cache.misses, "entries": len(_cache)}
+
+async def _fetch_status(bot: Bot, user_id: int, chat_id: int) -> Optional[bool]:
+    """A'zolik javobi; API xatosida (429, tarmoq, ...) None — bunday natija keshlanmaydi."""
     try:
         member = await bot.get_chat_member(chat_id, user_id)
     except Exception:
-        return False
+        return None
     status = getattr(member, "status", None)
     return status in (ChatMemberStatus.MEMBER, ChatMemberStatus.ADMINISTRATOR, ChatMemberStatus.CREATOR)
 
-async def check_subscriptions(user_id: int, bot: Bot) -> bool:
-    rows = await list_channels_full()
-    if not rows:
-        return True
-    for chat_id, *_ in rows:
-        try:
-            cid = int(chat_id)
-        except Exception:
-            return False
-        if not await _is_subscribed(bot, user_id, cid):
-            return False
-    return True
-
-async def get_unsubscribed(user_id: int, bot: Bot) -> List[Tuple[str, Optional[str], Optional[str], Optional[str], Optional[str]]]:
+async def _is_subscribed(bot: Bot, user_id: int, chat_id: int) -> bool:
+    key = (user_id, chat_id)
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    # single-flight: bir vaqtdagi bir xil so‘rovlar bitta API chaqiruvni kutadi
+    fut = _cache._inflight.get(key)
+    if fut is not None:
+        await asyncio.wait({fut})
+        if not fut.cancelled():
+            return fut.result()
+        return bool(await _fetch_status(bot, user_id, chat_id))
+
+    fut = asyncio.get_running_loop().create_future()
+    _cache._inflight[key] = fut
+    try:
+        status = await _fetch_status(bot, user_id, chat_id)
+        if status is not None:
+            _cache.put(key, status)
+        ok = bool(status)   # xatoda shu safar o‘tkazilmaydi, keyingi update qayta so‘raydi
+        fut.set_result(ok)
+        return ok
+    except BaseException:
+        fut.cancel()  # kutuvchilar o‘zlari qayta so‘raydi
+        raise
+    finally:
+        _cache._inflight.pop(key, None)
+
+# ============== Bir martalik baholash ==============
+ChannelRow = Tuple[str, Optional[str], Optional[str], Optional[str], Optional[str]]
+# list_channels_full() qatori: ChannelRow + is_join
+
+# bitta tekshiruv ichida bir vaqtdagi getChatMember soni (jarayon bo‘yicha emas —
+# boshqa foydalanuvchilarning so‘rovlari orqasida navbat turmaslik uchun)
+SUB_CONCURRENCY = int(os.getenv("SUB_CONCURRENCY", "16") or 16)
+
+@dataclass(frozen=True)
+class SubResult:
+    missing: Tuple[ChannelRow, ...] = ()
+
+    @property
+    def ok(self) -> bool:
+        return not self.missing
+
+# (update_id, user_id) -> natija: bitta update ichidagi keyingi guard'lar qayta so‘ramaydi
+_memo: ContextVar[Optional[Tuple[Tuple[int, int], SubResult]]] = ContextVar("sub_memo", default=None)
+
+async def _check_row(bot: Bot, user_id: int, row: ChannelRow, sem: asyncio.Semaphore) -> bool:
+    try:
+        cid = int(row[0])
+    except Exception:
+        return False
+    async with sem:
+        return await _is_subscribed(bot, user_id, cid)
+
+async def evaluate_subscriptions(user_id: int, bot: Bot, update_id: Optional[int] = None) -> SubResult:
+    """
+    Kanallar ro‘yxatini bir marta oladi, hammasini parallel tekshiradi va
+    obuna bo‘linmagan kanallarni qaytaradi. update_id berilsa natija shu
+    update davomida qayta ishlatiladi.
+    """
+    key = (update_id, user_id) if update_id is not None else None
+    if key is not None:
+        memo = _memo.get()
+        if memo is not None and memo[0] == key:
+            return memo[1]
+
     rows = await list_channels_full()
-    need: List[Tuple[str, Optional[str], Optional[str], Optional[str], Optional[str]]] = []
-    for chat_id, title, username, invite_link, url in rows:
-        try:
-            cid = int(chat_id)
-        except Exception:
-            need.append((str(chat_id), title, username, invite_link, url))
-            continue
-        if not await _is_subscribed(bot, user_id, cid):
-            need.append((str(chat_id), title, username, invite_link, url))
-    return need
+    if rows:
+        # join-request kanallarda kutilayotgan so‘rov obuna o‘rnida — API chaqirilmaydi
+        pending = await pending_join_chats(user_id) if any(r[5] for r in rows) else ()
+        rows = [r for r in rows if not (r[5] and str(r[0]) in pending)]
+        sem = asyncio.Semaphore(SUB_CONCURRENCY)
+        oks = await asyncio.gather(*(_check_row(bot, user_id, r, sem) for r in rows))
+        missing = tuple(
+            (str(r[0]), r[1], r[2], r[3], r[4]) for r, ok in zip(rows, oks) if not ok
+        )
+        result = SubResult(missing)
+    else:
+        result = SubResult()
+
+    if key is not None:
+        _memo.set((key, result))
+    return result
@@ -0,0 +1,110 @@
+# webhook.py
+# Webhook rejimi: aiohttp server, secret-token tekshiruvi, parallel ishlov
+# (in-flight limit bilan) va to‘g‘ri to‘xtash.
+#
+# Lokal sinov: WEBHOOK_URL bo‘sh qoldirilsa set_webhook chaqirilmaydi, update'ni
+# qo‘lda POST qilish mumkin:
+#   curl -H "X-Telegram-Bot-Api-Secret-Token: $WEBHOOK_SECRET" \
+#        -H "Content-Type: application/json" -d @update.json \
+#        http://127.0.0.1:8080/webhook
+from __future__ import annotations
+import asyncio
+import hmac
+import os
+import signal
+from typing import Set
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "").rstrip("/")       # tashqi manzil, masalan https://bot.example.com
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBAPP_HOST = os.getenv("WEBAPP_HOST", "0.0.0.0")
+WEBAPP_PORT = int(os.getenv("WEBAPP_PORT", "8080") or 8080)
+WEBHOOK_MAX_INFLIGHT = int(os.getenv("WEBHOOK_MAX_INFLIGHT", "100") or 100)
+SHUTDOWN_GRACE = float(os.getenv("WEBHOOK_SHUTDOWN_GRACE", "25") or 25)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class UpdateHandler:
+    """
+    Har bir update alohida task'da ishlanadi; bir vaqtda `max_inflight` tadan
+    ko‘p bo‘lsa, javob kechiktiriladi (Telegram o‘zi kutib turadi).
+    """
+
+    def __init__(self, dp: Dispatcher, bot: Bot, secret: str = WEBHOOK_SECRET,
+                 max_inflight: int = WEBHOOK_MAX_INFLIGHT):
+        self.dp = dp
+        self.bot = bot
+        self.secret = secret
+        self._sem = asyncio.Semaphore(max_inflight)
+        self._tasks: Set[asyncio.Task] = set()
+        self._closing = False
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if self.secret and not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret):
+            return web.Response(status=401)
+        if self._closing:
+            return web.Response(status=503)
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except Exception:
+            return web.Response(status=400)
+
+        await self._sem.acquire()
+        task = asyncio.create_task(self._process(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.Response()
+
+    async def _process(self, update: Update) -> None:
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception as e:
+            print(f"[webhook] update {update.update_id} xatosi: {e!r}")
+        finally:
+            self._sem.release()
+
+    async def drain(self, timeout: float = SHUTDOWN_GRACE) -> None:
+        """Yangi update qabul qilmay, ishlanayotganlarini tugashini kutadi."""
+        self._closing = True
+        if self._tasks:
+            await asyncio.wait(set(self._tasks), timeout=timeout)
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot) -> None:
+    handler = UpdateHandler(dp, bot)
+    app = web.Application()
+    app.router.add_post(WEBHOOK_PATH, handler.handle)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, WEBAPP_HOST, WEBAPP_PORT)
+    await site.start()
+
+    if WEBHOOK_URL:
+        await bot.set_webhook(
+            WEBHOOK_URL + WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET or None,
+            allowed_updates=dp.resolve_used_update_types(),
+            max_connections=min(100, WEBHOOK_MAX_INFLIGHT),
+        )
+    print(f"Webhook: {WEBAPP_HOST}:{WEBAPP_PORT}{WEBHOOK_PATH}")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows
+
+    try:
+        await stop.wait()
+    finally:
+        # bot.session'ni chaqiruvchi yopadi — fon ishlari (approver, reklama) to‘xtagandan keyin
+        await handler.drain()
+        await runner.cleanup()